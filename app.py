@@ -7,7 +7,20 @@
 import streamlit as st  # Streamlit is used to create the web app UI
 import openai           # openai is used to interact with OpenAI's GPT models
 import os               # os is used to access environment variables
+import time             # time is used to enforce the deadline of the primary model
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError  # runs the primary model call in the background
 from dotenv import load_dotenv  # dotenv loads environment variables from a .env file
+from streamlit.runtime import Runtime  # tells whether a browser session is still connected
+from streamlit.runtime.scriptrunner import get_script_run_ctx  # identifies the current browser session
+import backends         # shared helpers for calling OpenAI and local Ollama models
+import conversation     # plan history compaction for follow-up refinements
+import formatting       # checks and repairs the output format locally
+import generations      # cancels backend calls nobody is waiting for
+import leaderboard      # model benchmark results (benchmark_models.py)
+import long_input       # condenses very long goal descriptions
+import profiling        # opt-in profiling of single requests
+import request_log      # background-written log of requests and responses
+import response_cache   # shared on-disk cache of generated plans
 
 # ===================================================
 # LOAD ENVIRONMENT VARIABLES
@@ -181,23 +194,12 @@ st.markdown("""
 # ===================================================
 # MODEL OPTIONS CONFIGURATION
 # ===================================================
-# Define the list of available AI models that can be selected in the sidebar
-# This includes OpenAI's API and various locally-hosted models
-# The first option (OpenAI API) requires an API key, while others use local processing
-MODEL_OPTIONS = [
-    "OpenAI API",      # Uses OpenAI's cloud-based models (requires API key)
-    "dolphin-phi:latest",  # Local Dolphin-Phi model
-    "gemma3:1b",       # Google's Gemma 1B parameter model
-    "smollm:135m",     # Small language model (135M parameters)
-    "llama3.1:8b",     # Meta's LLaMA 3.1 (8B parameters)
-    "llama2-uncensored:latest",  # Uncensored version of LLaMA 2
-    "phi3.5:latest",   # Microsoft's Phi-3.5 model
-    "wizard-vicuna-uncensored:30b",  # Large 30B parameter model
-    "dolphin-mistral:latest",  # Dolphin model based on Mistral architecture
-    "llama2-uncensored:7b",    # Smaller 7B parameter version of LLaMA 2 uncensored
-    "llama3.2:3b",            # Compact 3B parameter version of LLaMA 3.2
-    "llava:latest"             # Multimodal model that can process both text and images
-]
+# The available models are listed in backends.py (MODEL_OPTIONS)
+# If benchmark_models.py has written a leaderboard, the best models are listed
+# first and the recommended model is selected by default
+model_leaderboard = leaderboard.load()
+MODEL_OPTIONS = leaderboard.order_models(backends.MODEL_OPTIONS, model_leaderboard)
+DRAFT_MODEL_OPTIONS = leaderboard.order_models(backends.DRAFT_MODEL_OPTIONS, model_leaderboard)
 
 # ===================================================
 # SIDEBAR MODEL SELECTION UI
@@ -210,12 +212,19 @@ st.sidebar.markdown('<span class="sidebar-model-label">Choose Model</span>', uns
 # - Empty label ("") keeps the interface clean since we already have a heading
 # - MODEL_OPTIONS provides the list of available models
 # - key="selected_model" gives this element a unique identifier for Streamlit
+# - index starts on the leaderboard's recommended model (the first model without one)
 selected_model = st.sidebar.selectbox(
     "",  # No visible label for accessibility, but styled above
     MODEL_OPTIONS,
+    index=MODEL_OPTIONS.index(leaderboard.default_model(MODEL_OPTIONS, model_leaderboard)),
     key="selected_model_test"
 )
 
+# Benchmark results of the selected model, if it has been benchmarked
+model_stats = leaderboard.describe(leaderboard.entry_for(selected_model, model_leaderboard))
+if model_stats:
+    st.sidebar.caption(f"Benchmark: {model_stats}")
+
 # ===================================================
 # API KEY INPUT FIELD
 # ===================================================
@@ -249,6 +258,39 @@ model_temperature = st.sidebar.slider(
     help="Controls randomness: lower values = more focused and predictable; higher = more creative and diverse."
 )
 
+# ===================================================
+# PROGRESSIVE MODE CONTROLS
+# ===================================================
+# Progressive mode sends the goal to a tiny local model and to the selected
+# model at the same time. The local draft appears almost immediately and is
+# replaced in place by the refined answer when it arrives.
+# If the selected model fails or misses its deadline, the draft is kept.
+st.sidebar.markdown('<div style="margin-top:1.5em; margin-bottom:0.3em;"><strong>Progressive Mode</strong></div>', unsafe_allow_html=True)
+progressive_mode = st.sidebar.checkbox(
+    "Show a fast local draft first",
+    value=False,
+    help="Requires Ollama running locally with the draft model pulled."
+)
+
+# Tiny local models that answer fast enough to be used for drafts
+# (listed in backends.py; the leaderboard's fastest one is selected by default)
+draft_model = st.sidebar.selectbox(
+    "Draft model",
+    DRAFT_MODEL_OPTIONS,
+    index=DRAFT_MODEL_OPTIONS.index(leaderboard.default_model(DRAFT_MODEL_OPTIONS, model_leaderboard, "draft_model")),
+    disabled=not progressive_mode
+)
+
+# Seconds to wait for the refined answer before settling on the draft
+refine_deadline = st.sidebar.slider(
+    "Refined answer deadline (seconds)",
+    min_value=5,
+    max_value=120,
+    value=30,
+    step=5,
+    disabled=not progressive_mode
+)
+
 # ===================================================
 # GOAL CLASSIFIER FUNCTION
 # ===================================================
@@ -303,7 +345,14 @@ user_input = st.text_area(
 # ===================================================
 # Create a button that users click to process their input
 # When clicked, this triggers the goal validation and API request flow
-submit_button = st.button("Submit")
+# "Regenerate" does the same but skips the response cache, so a plan the user
+# does not like can be replaced with a fresh one (which is then cached instead)
+submit_column, regenerate_column = st.columns([1, 6])
+with submit_column:
+    submit_button = st.button("Submit")
+with regenerate_column:
+    regenerate_button = st.button("Regenerate", help="Make a new plan even if this goal was answered before")
+submit_button = submit_button or regenerate_button
 
 # ===================================================
 # OUTPUT FORMAT SELECTION
@@ -347,151 +396,426 @@ goal_examples = [
     "Learn conversational Spanish"                           # Language learning
 ]
 
+# ===================================================
+# RESPONSE DISPLAY HELPERS
+# ===================================================
+# Shared by the first plan and by follow-up refinements
+def describe_provider(model):
+    """
+    Returns (spinner message, provider name, logo path or None) for a model.
+    These customize the spinner and the header shown above the response.
+    """
+    if backends.is_openai_model(model):
+        return "Sending to OpenAI...", "OpenAI", "Graphics/openai.svg"   # OpenAI logo for OpenAI models
+    return f"Sending to {model}...", model, None                         # No logo for local models
+
+def show_response_header(placeholder, name, logo, label="response"):
+    """
+    Display the icon, provider name, and label in an aligned row of columns.
+    The header lives in a placeholder so it can be swapped later, e.g. when
+    the refined answer replaces the draft in progressive mode.
+    """
+    with placeholder.container():
+        col1, col2, col3 = st.columns([1, 6, 8])      # Column width ratio
+        # Column 1: Display the model/provider icon (left empty when there is no icon file)
+        with col1:
+            if logo and os.path.exists(logo):
+                st.image(logo, width=28)              # Show model icon at appropriate size
+        # Column 2: Display the provider name and label
+        with col2:
+            st.markdown(
+                f"<b>{name}</b> <span style='font-size:1.13em; font-weight:600; color:#444;'>{label}</span>",
+                unsafe_allow_html=True
+            )
+        # Add spacing below the header for visual separation
+        st.write("")
+
+def stream_response(placeholder, model, messages, spinner_message, generation=None):
+    """
+    Stream a model response into a placeholder and return the full text.
+    A spinner is shown until the first words arrive.
+    """
+    with st.spinner(spinner_message), profiling.stage("backend_call"):
+        stream = backends.stream_completion(model, messages, model_temperature, 300, generation)
+        text = next(stream, "")
+    # The rest of the stream: waiting for tokens and drawing them as they arrive
+    with profiling.stage("render"):
+        placeholder.markdown(text + " ▌")
+        for piece in stream:
+            text += piece
+            placeholder.markdown(text + " ▌")
+    # Display the final response, removing any extra whitespace
+    # The markdown formatting preserves the structure (paragraphs, lists, etc.)
+    with profiling.stage("format_repair"):
+        text = enforce_output_format(text.strip(), model, generation)
+    placeholder.markdown(text)
+    return text
+
+def enforce_output_format(text, model, generation=None):
+    """
+    Make the response match the selected output format.
+    Models often ignore the format instruction; the text is repaired locally
+    when possible and the model is only asked to reformat as a last resort.
+    """
+    return formatting.ensure_format(
+        text,
+        output_format,
+        reask=lambda t: backends.reformat(model, t, output_format, generation=generation)
+    )
+
+# ===================================================
+# PLAN HISTORY
+# ===================================================
+# The latest plan and the follow-ups that refined it are kept for this browser
+# session so users can keep adjusting a plan instead of starting over.
+# Older turns are compacted (see conversation.py) to keep every prompt small.
+if "plan_history" not in st.session_state:
+    st.session_state.plan_history = []
+
+def summarize_history(text, generation=None):
+    """Summarize older conversation turns with the selected model (used for compaction)."""
+    return backends.summarize(selected_model, text, conversation.SUMMARY_INSTRUCTIONS, generation=generation)
+
+# ===================================================
+# IN-FLIGHT GENERATIONS
+# ===================================================
+# Each request's backend calls are tracked per browser session (see generations.py)
+# They are aborted when the same session submits again, when the tab is closed,
+# or when the request passes its deadline, so backend capacity goes to requests
+# someone is still waiting for
+def session_is_active(session_id):
+    """True while the browser session is still connected."""
+    return Runtime.instance().is_active_session(session_id)
+
+generations.tracker.watch_sessions(session_is_active)
+
+def start_generation():
+    """Start tracking this session's request; its previous request is cancelled."""
+    ctx = get_script_run_ctx()
+    return generations.tracker.start(ctx.session_id if ctx else None)
+
+# ===================================================
+# REQUEST PROFILING
+# ===================================================
+# Add ?profile=1 (or ?profile=cprofile) to the page URL to profile the next
+# requests, or set GOAL_PROFILE on the server (see profiling.py)
+# Profiles are written to the profiles/ folder; nothing is recorded otherwise
+profile_param = st.query_params.get("profile", "")
+profile_mode = "cprofile" if profile_param == "cprofile" else ("sample" if profile_param not in ("", "0") else None)
+
+def start_profile(**metadata):
+    """Start profiling a request (a do-nothing profile unless profiling is enabled)."""
+    return profiling.start_request(
+        profile_mode, entrypoint="app", model=selected_model,
+        output_format=output_format, temperature=model_temperature, **metadata
+    )
+
+def finish_profile(profile, **metadata):
+    """Write the profile, if one was recorded, and show where it went."""
+    path = profile.finish(**metadata)
+    if path:
+        st.caption(f"Profile written to {path}")
+
+# ===================================================
+# REQUEST LOG
+# ===================================================
+# Every submitted goal and refinement is recorded with its response in the
+# request log (logs/, see request_log.py) for analytics, cache warming and replay
+# Records are written by a background thread, so this never waits on the disk
+def log_request(started, **fields):
+    request_log.default_log().log(
+        source="app", model=selected_model, output_format=output_format,
+        temperature=model_temperature, latency_ms=round((time.monotonic() - started) * 1000, 1),
+        **fields
+    )
+
 # ===================================================
 # MAIN APPLICATION LOGIC
 # ===================================================
 # This section contains the core logic that runs when the user submits their input
 # It validates the input, processes it if valid, and displays appropriate feedback
 if submit_button:
-    # -----------------------------------------------
-    # EMPTY INPUT VALIDATION
-    # -----------------------------------------------
-    # Check if the user submitted an empty input
-    # If so, display a warning message prompting them to enter text
-    if user_input.strip() == "":
-        st.warning("Please enter some text.")
+    profile = start_profile(request="submit", goal_chars=len(user_input))
+    request_started = time.monotonic()
+    plan = ""
+    cached_plan = None
+    messages = None
+    condensed_goal = None
+    error = None
+    draft_kept = False
+    valid_goal = None
+    try:
+        # A submit starts over: "Refine this plan" only appears again once this goal has a plan
+        st.session_state.plan_history = []
+        with profiling.stage("is_goal"):
+            valid_goal = is_goal(user_input)
+    
+        # -----------------------------------------------
+        # EMPTY INPUT VALIDATION
+        # -----------------------------------------------
+        # Check if the user submitted an empty input
+        # If so, display a warning message prompting them to enter text
+        if user_input.strip() == "":
+            st.warning("Please enter some text.")
         
-    # -----------------------------------------------
-    # INVALID GOAL HANDLING
-    # -----------------------------------------------
-    # If the input doesn't meet our criteria for a goal (using the is_goal function)
-    # Show a styled message explaining what constitutes a valid goal with examples
-    elif not is_goal(user_input):
-        st.markdown(f"""
-            <div style='background: #fff; border-radius: 10px; padding: 1.2em 1.5em; margin-top: 1em; color: #222; font-size: 1.08em; box-shadow: 0 2px 12px rgba(0,0,0,0.06); border: 1px solid #e5e7eb;'>
-                <div style='font-size:1.3em; font-weight: bold; margin-bottom: 0.3em;'>❌ This is NOT classified as a goal.</div>
-                <div style='margin-bottom: 0.7em;'>
-                    <span style='font-weight: 500;'>A goal is defined as:</span> <span style='font-style: italic;'>'{definition}'</span>
+        # -----------------------------------------------
+        # INVALID GOAL HANDLING
+        # -----------------------------------------------
+        # If the input doesn't meet our criteria for a goal (using the is_goal function)
+        # Show a styled message explaining what constitutes a valid goal with examples
+        elif not valid_goal:
+            st.markdown(f"""
+                <div style='background: #fff; border-radius: 10px; padding: 1.2em 1.5em; margin-top: 1em; color: #222; font-size: 1.08em; box-shadow: 0 2px 12px rgba(0,0,0,0.06); border: 1px solid #e5e7eb;'>
+                    <div style='font-size:1.3em; font-weight: bold; margin-bottom: 0.3em;'>❌ This is NOT classified as a goal.</div>
+                    <div style='margin-bottom: 0.7em;'>
+                        <span style='font-weight: 500;'>A goal is defined as:</span> <span style='font-style: italic;'>'{definition}'</span>
+                    </div>
+                    <div style='font-weight: 500; margin-bottom: 0.2em;'>Examples of goals:</div>
+                    <ul style='margin-top:0;margin-bottom:0.7em;'>
+                        {''.join(f'<li style="margin-bottom:0.18em;">{eg}</li>' for eg in goal_examples)}
+                    </ul>
+                    <div style='margin-top:0.7em;'>Please submit a valid goal.</div>
                 </div>
-                <div style='font-weight: 500; margin-bottom: 0.2em;'>Examples of goals:</div>
-                <ul style='margin-top:0;margin-bottom:0.7em;'>
-                    {''.join(f'<li style="margin-bottom:0.18em;">{eg}</li>' for eg in goal_examples)}
-                </ul>
-                <div style='margin-top:0.7em;'>Please submit a valid goal.</div>
-            </div>
-        """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
         
-    # -----------------------------------------------
-    # VALID GOAL PROCESSING
-    # -----------------------------------------------
-    # If the input is a valid goal, proceed with processing it
-    # This will involve sending the goal to the AI model for generating a plan
-    else:
         # -----------------------------------------------
-        # API KEY VALIDATION
+        # VALID GOAL PROCESSING
         # -----------------------------------------------
-        # Check if the user has provided an API key
-        # If not, display a message prompting them to enter one
-        if not api_key:
-            st.info("Enter your OpenAI API key in the sidebar to enable OpenAI calls.")
+        # If the input is a valid goal, proceed with processing it
+        # This will involve sending the goal to the AI model for generating a plan
         else:
             # -----------------------------------------------
-            # API KEY CONFIGURATION
+            # API KEY VALIDATION
             # -----------------------------------------------
-            # Set the OpenAI API key for this session using the provided key
-            # This key is not stored permanently and only exists for the current session
-            openai.api_key = api_key
-            
-            # -----------------------------------------------
-            # MODEL SELECTION AND DISPLAY PREPARATION
-            # -----------------------------------------------
-            # Determine which provider/model is being used to customize the UI
-            # This affects the spinner message and the provider name shown with the response
-            if selected_model == "OpenAI API" or selected_model.lower() == "gpt-3.5-turbo":
-                spinner_message = "Sending to OpenAI..."  # Message shown during API call
-                provider_name = "OpenAI"                  # Provider name shown with response
+            # Check if the user has provided an API key when an OpenAI model is used
+            # Local Ollama models do not need a key
+            if not api_key and backends.is_openai_model(selected_model):
+                st.info("Enter your OpenAI API key in the sidebar to enable OpenAI calls.")
             else:
-                spinner_message = f"Sending to {selected_model}..."  # Custom message for other models
-                provider_name = selected_model                      # Use selected model name as provider
+                # -----------------------------------------------
+                # API KEY CONFIGURATION
+                # -----------------------------------------------
+                # Set the OpenAI API key for this session using the provided key
+                # This key is not stored permanently and only exists for the current session
+                openai.api_key = api_key
             
-            # -----------------------------------------------
-            # API REQUEST WITH VISUAL FEEDBACK
-            # -----------------------------------------------
-            # Display a spinner while waiting for the API response
-            # This provides visual feedback that the app is working
-            with st.spinner(spinner_message):
+                # A new submit supersedes whatever this session was still generating
+                generation = start_generation()
                 try:
                     # -----------------------------------------------
-                    # MODEL API CALL
+                    # MODEL SELECTION AND DISPLAY PREPARATION
                     # -----------------------------------------------
-                    # Currently using a fixed model (gpt-3.5-turbo)
-                    # Future enhancement: Make this dynamic based on user selection
-                    model = "gpt-3.5-turbo"
-                    
-                    # Make the API call to OpenAI's chat completions endpoint
-                    # This sends the user's goal and formatting instructions to the AI
-                    response = openai.chat.completions.create(
-                        model=model,  # The AI model to use
-                        messages=[
-                            # System message defines the AI's role and behavior
-                            {"role": "system", "content": "You are an assistant that helps users break down their goals into actionable steps."},
-                            
-                            # User message contains the goal and formatting instructions
-                            # The formatting varies based on the user's selected output format
-                            {"role": "user", "content": f"My goal: {user_input}\n" + (
-                                # Standard format: Mix of paragraphs, bullets, and numbered lists
-                                "Please break this down into actionable steps. Use a mix of regular paragraphs for overview and context, bullet points for general items, and numbered lists for sequential steps. Make it visually organized and easy to follow." if output_format == "Standard" else
-                                # Bullet List format: Entire response as bullet points only
-                                "Please break this down into actionable steps. Format your ENTIRE response as a bullet list ONLY. Do not use paragraphs or numbered lists." if output_format == "Bullet List" else
-                                # Numbered List format: Entire response as a numbered list only
-                                "Please break this down into actionable steps. Format your ENTIRE response as a numbered list ONLY. Do not use paragraphs or bullet points."
-                            )}
-                        ],
-                        max_tokens=300,                # Limit response length
-                        temperature=model_temperature  # Use the temperature from the slider
-                    )
-                    
+                    # Determine which provider/model is being used to customize the UI
+                    # This affects the spinner message and the provider name shown with the response
+                    spinner_message, provider_name, logo_path = describe_provider(selected_model)
+            
                     # -----------------------------------------------
-                    # RESPONSE DISPLAY - HEADER
+                    # LONG GOAL DESCRIPTIONS
                     # -----------------------------------------------
-                    # Select the appropriate logo based on the model used
-                    if selected_model == "OpenAI API" or model == "gpt-3.5-turbo":
-                        logo_path = "Graphics/openai.svg"             # OpenAI logo for OpenAI models
-                        model_cap = model[:1].upper() + model[1:]     # Capitalize model name (e.g., Gpt-3.5-turbo)
-                        model_disp = model_cap                        # Display name for the model
-                    else:
-                        logo_path = "static/ai-generic.png"           # Generic AI logo for other models
-                        model_disp = selected_model                   # Use the selected model name
-                    
-                    # Create a three-column layout for the response header
-                    # This displays the model icon, provider name, and "response" label
-                    col1, col2, col3 = st.columns([1, 6, 8])          # Column width ratio
-                    
-                    # Column 1: Display the model/provider icon
-                    with col1:
-                        st.image(logo_path, width=28)                 # Show model icon at appropriate size
-                    
-                    # Column 2: Display the provider name and "response" label
-                    with col2:
-                        st.markdown(
-                            f"<b>{provider_name}</b> <span style='font-size:1.13em; font-weight:600; color:#444;'>response</span>",
-                            unsafe_allow_html=True
-                        )
-                    
-                    # Add spacing below the header for visual separation
-                    st.write("")  
-                    
+                    # A pasted project brief is condensed into a short goal statement first
+                    # (chunks are summarized concurrently, see long_input.py), which keeps
+                    # the prompt small and the wait about the same for any input size
+                    goal = user_input
+                    if long_input.needs_condensing(user_input):
+                        try:
+                            with st.spinner("Condensing your goal description..."), profiling.stage("condense_input"):
+                                condensed_goal = long_input.condense(user_input, selected_model, generation)
+                            goal = condensed_goal
+                            with st.expander("Condensed goal"):
+                                st.write(condensed_goal)
+                        except Exception as e:
+                            st.caption(f"Could not condense the goal description, sending it as is: {e}")
+            
+                    # Build the chat messages once; the draft and refined answers share them
+                    # The formatting instructions vary based on the user's selected output format
+                    with profiling.stage("build_prompt"):
+                        messages = backends.build_messages(goal, output_format)
+            
                     # -----------------------------------------------
-                    # RESPONSE DISPLAY - CONTENT
+                    # RESPONSE DISPLAY
                     # -----------------------------------------------
-                    # Display the AI's response, removing any extra whitespace
-                    # The markdown formatting preserves the structure (paragraphs, lists, etc.)
-                    st.markdown(response.choices[0].message.content.strip())
+                    # The header and the response are written into placeholders so they
+                    # can be updated in place as text streams in
+                    header_placeholder = st.empty()
+                    response_placeholder = st.empty()
+                    plan = ""
+                    cacheable = False  # Only answers from the selected model are cached, never drafts
+            
+                    # Repeated goals are answered straight from the response cache
+                    # (unless the user asked to regenerate; the new plan then replaces the cached one)
+                    cache = response_cache.default_cache()
+                    if not regenerate_button:
+                        with profiling.stage("cache_lookup"):
+                            cached_plan = cache.get(selected_model, messages, model_temperature)
+            
+                    if cached_plan:
+                        with profiling.stage("render"):
+                            show_response_header(header_placeholder, provider_name, logo_path)
+                            response_placeholder.markdown(cached_plan)
+                        plan = cached_plan
+                    elif progressive_mode:
+                        # -----------------------------------------------
+                        # PROGRESSIVE MODE: LOCAL DRAFT, THEN REFINED ANSWER
+                        # -----------------------------------------------
+                        # Start the selected model in a background thread right away
+                        # Streamlit elements are only updated from this (the script) thread
+                        started = time.monotonic()
+                        executor = ThreadPoolExecutor(max_workers=1)
+                        refined_future = executor.submit(
+                            profiling.bind(backends.complete), selected_model, messages, model_temperature, 300, generation
+                        )
+                
+                        # Stream the draft from the tiny local model while we wait
+                        # Stop early if the refined answer is already available (but not
+                        # if the selected model failed: then the draft becomes the answer)
+                        show_response_header(header_placeholder, draft_model, None, "draft")
+                        draft = ""
+                        try:
+                            with profiling.stage("draft"):
+                                for piece in backends.stream_completion(draft_model, messages, model_temperature, 300, generation):
+                                    draft += piece
+                                    response_placeholder.markdown(draft + " ▌")
+                                    if refined_future.done() and refined_future.exception() is None:
+                                        break
+                        except Exception as e:
+                            # A failed draft is not fatal; the refined answer is still coming
+                            st.caption(f"Draft model unavailable: {e}")
+                        response_placeholder.markdown(draft.strip())
+                
+                        # Wait for the refined answer, but never past the deadline
+                        remaining = max(0.0, refine_deadline - (time.monotonic() - started))
+                        with st.spinner(f"Refining with {provider_name}..."):
+                            try:
+                                with profiling.stage("backend_call"):
+                                    refined = refined_future.result(timeout=remaining)
+                                with profiling.stage("format_repair"):
+                                    plan = enforce_output_format(refined, selected_model, generation)
+                                cacheable = True
+                                # Replace the draft in place with the refined answer
+                                show_response_header(header_placeholder, provider_name, logo_path)
+                                response_placeholder.markdown(plan)
+                            except Exception as e:
+                                # Keep the draft as the answer if the refined call failed or timed out
+                                plan = formatting.ensure_format(draft.strip(), output_format) if draft.strip() else ""
+                                timed_out = isinstance(e, FutureTimeoutError)
+                                error = "timed out" if timed_out else (str(e) or type(e).__name__)
+                                if plan:
+                                    draft_kept = True
+                                    response_placeholder.markdown(plan)
+                                    if timed_out:
+                                        st.caption(f"{provider_name} did not answer in time; showing the local draft.")
+                                    else:
+                                        st.caption(f"{provider_name} failed ({error}); showing the local draft.")
+                                else:
+                                    st.error(f"Model API error: {error}")
+                        # Don't block the page on a call that missed its deadline
+                        executor.shutdown(wait=False)
+                    else:
+                        # -----------------------------------------------
+                        # MODEL API CALL
+                        # -----------------------------------------------
+                        try:
+                            show_response_header(header_placeholder, provider_name, logo_path)
+                            plan = stream_response(response_placeholder, selected_model, messages, spinner_message, generation)
+                            cacheable = True
                     
-                # -----------------------------------------------
-                # ERROR HANDLING
-                # -----------------------------------------------
-                # Catch and display any errors that occur during the API call
-                # Common errors: invalid API key, network issues, rate limiting
-                except Exception as e:
-                    st.error(f"OpenAI API error: {e}")  # Show error message with details
+                        # -----------------------------------------------
+                        # ERROR HANDLING
+                        # -----------------------------------------------
+                        # Catch and display any errors that occur during the API call
+                        # Common errors: invalid API key, network issues, rate limiting
+                        except Exception as e:
+                            error = str(e)
+                            st.error(f"Model API error: {e}")  # Show error message with details
+                finally:
+                    # Abort anything this request left running (e.g. a primary call past its deadline),
+                    # also when Streamlit stops this run early because a widget changed
+                    generations.tracker.finish(generation)
+            
+                if plan and cacheable:
+                    cache.put(selected_model, messages, model_temperature, plan)
+            
+                # A new goal starts a new conversation with this plan as its first answer
+                if plan:
+                    st.session_state.plan_history = [
+                        {"role": "user", "content": messages[-1]["content"]},
+                        {"role": "assistant", "content": plan},
+                    ]
+    
+        if user_input.strip():
+            log_request(
+                request_started, request="submit", goal=user_input, valid_goal=valid_goal,
+                condensed_goal=condensed_goal, messages=messages, response=plan or None, cache_hit=bool(cached_plan),
+                regenerate=regenerate_button,
+                draft_kept=draft_kept, error=error
+            )
+    finally:
+        # Written even when Streamlit stops this run early (e.g. the user submits again)
+        finish_profile(profile, valid_goal=valid_goal, cache_hit=bool(cached_plan), plan_chars=len(plan))
+
+# ===================================================
+# FOLLOW-UP REFINEMENT
+# ===================================================
+# Once a plan exists, users can ask for changes ("make it fit into 4 weeks")
+# The model receives the earlier turns, compacted to a fixed token budget,
+# so each refinement costs about the same however long the conversation runs
+if st.session_state.plan_history:
+    # Show the latest plan again after reruns (the submit run has already shown it)
+    plan_header = st.empty()
+    plan_body = st.empty()
+    if not submit_button:
+        spinner_message, provider_name, logo_path = describe_provider(selected_model)
+        show_response_header(plan_header, provider_name, logo_path, "latest plan")
+        plan_body.markdown(st.session_state.plan_history[-1]["content"])
+    
+    followup = st.text_input(
+        "Refine this plan:",
+        placeholder="e.g. Make it fit into 4 weeks",
+        key="followup"
+    )
+    if st.button("Refine"):
+        if followup.strip() == "":
+            st.warning("Please describe what to change.")
+        elif not api_key and backends.is_openai_model(selected_model):
+            st.info("Enter your OpenAI API key in the sidebar to enable OpenAI calls.")
+        else:
+            openai.api_key = api_key
+            profile = start_profile(request="refine", followup_chars=len(followup))
+            request_started = time.monotonic()
+            plan = None
+            error = None
+            messages = None
+            history = st.session_state.plan_history
+            try:
+                generation = start_generation()
+                try:
+                    spinner_message, provider_name, logo_path = describe_provider(selected_model)
+                    # Fold older turns into a summary if the history is over budget
+                    with profiling.stage("compact_history"):
+                        history = conversation.compact_history(
+                            st.session_state.plan_history, lambda text: summarize_history(text, generation)
+                        )
+                    with profiling.stage("build_prompt"):
+                        messages = backends.build_followup_messages(history, followup, output_format)
+                    try:
+                        # The refined plan replaces the previous one in place
+                        show_response_header(plan_header, provider_name, logo_path, "refined plan")
+                        plan = stream_response(plan_body, selected_model, messages, spinner_message, generation)
+                        st.session_state.plan_history = history + [
+                            {"role": "user", "content": messages[-1]["content"]},
+                            {"role": "assistant", "content": plan},
+                        ]
+                    except Exception as e:
+                        error = str(e)
+                        st.error(f"Model API error: {e}")
+                finally:
+                    # Also runs when Streamlit stops this run early because a widget changed
+                    generations.tracker.finish(generation)
+                # Refinements have no "goal" field, so cache warming skips them
+                log_request(
+                    request_started, request="refine", followup=followup,
+                    messages=messages, response=plan, error=error
+                )
+            finally:
+                # Written even when Streamlit stops this run early
+                finish_profile(profile, history_messages=len(history))
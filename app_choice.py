@@ -2,6 +2,7 @@ import streamlit as st
 import requests
 import os
 from dotenv import load_dotenv
+import formatting
 
 # Load environment variables (for default OpenAI key, if any)
 load_dotenv(override=True)
@@ -55,6 +56,8 @@ if page == "OpenAI Assistant":
                         temperature=temp,
                     )
                     output = response.choices[0].message.content.strip()
+                    # Repair the list format locally instead of asking again
+                    output = formatting.ensure_format(output, fmt)
                     st.success("Response:")
                     st.markdown(output)
                 except Exception as e:
@@ -102,6 +105,7 @@ elif page == "Local Ollama Assistant":
                     response.raise_for_status()
                     result = response.json()
                     output = result.get("response", "[No response returned]").strip()
+                    output = formatting.ensure_format(output, fmt)
                     st.success("Response:")
                     st.markdown(output)
                 except Exception as e:
@@ -0,0 +1,194 @@
+# backends.py
+# -----------
+# Shared helpers for talking to the language model backends used by the apps.
+# Two kinds of backends are supported:
+#   - OpenAI's hosted chat models (selected as "OpenAI API" in the sidebar)
+#   - Local models served by Ollama (every other entry in MODEL_OPTIONS)
+# Both are exposed through the same small set of functions so the Streamlit
+# app and the CLI do not need to care which backend they are talking to.
+
+# --- Import required libraries ---
+import json      # json is used to decode Ollama's streamed response lines
+import os        # os is used to read backend configuration from the environment
+import openai    # openai is used to interact with OpenAI's GPT models
+import requests  # requests is used to call the local Ollama HTTP API
+import cassettes # optional record/replay of backend traffic
+import generations  # cancellation of calls nobody is waiting for any more
+
+# ===================================================
+# BACKEND CONFIGURATION
+# ===================================================
+# The OpenAI model used when "OpenAI API" is selected
+OPENAI_MODEL = "gpt-3.5-turbo"
+
+# Base URL of the local Ollama server (override with the OLLAMA_HOST variable)
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+
+# Seconds to wait for a local model before giving up
+OLLAMA_TIMEOUT = 60
+
+# ===================================================
+# MODEL OPTIONS CONFIGURATION
+# ===================================================
+# Define the list of available AI models that can be selected in the sidebar
+# (app.py shows them ordered by the benchmark leaderboard, see leaderboard.py)
+# This includes OpenAI's API and various locally-hosted models
+# The first option (OpenAI API) requires an API key, while others use local processing
+MODEL_OPTIONS = [
+    "OpenAI API",      # Uses OpenAI's cloud-based models (requires API key)
+    "dolphin-phi:latest",  # Local Dolphin-Phi model
+    "gemma3:1b",       # Google's Gemma 1B parameter model
+    "smollm:135m",     # Small language model (135M parameters)
+    "llama3.1:8b",     # Meta's LLaMA 3.1 (8B parameters)
+    "llama2-uncensored:latest",  # Uncensored version of LLaMA 2
+    "phi3.5:latest",   # Microsoft's Phi-3.5 model
+    "wizard-vicuna-uncensored:30b",  # Large 30B parameter model
+    "dolphin-mistral:latest",  # Dolphin model based on Mistral architecture
+    "llama2-uncensored:7b",    # Smaller 7B parameter version of LLaMA 2 uncensored
+    "llama3.2:3b",            # Compact 3B parameter version of LLaMA 3.2
+    "llava:latest"             # Multimodal model that can process both text and images
+]
+
+# Tiny local models that answer fast enough to be used for progressive-mode drafts
+DRAFT_MODEL_OPTIONS = ["smollm:135m", "gemma3:1b"]
+
+# A single HTTP session is reused for every Ollama call so the TCP connection
+# to the local server stays open between requests
+# The pool is sized so concurrent users each keep their own open connection
+ollama_session = requests.Session()
+ollama_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=64))
+
+# Record or replay all backend traffic when LLM_CASSETTE is set (see cassettes.py)
+cassette = cassettes.install_from_env(ollama_session)
+
+# ===================================================
+# PROMPT BUILDING
+# ===================================================
+# System message that defines the assistant's role and behavior
+SYSTEM_PROMPT = "You are an assistant that helps users break down their goals into actionable steps."
+
+# Formatting instructions appended to the goal for each output format
+FORMAT_INSTRUCTIONS = {
+    # Standard format: Mix of paragraphs, bullets, and numbered lists
+    "Standard": "Please break this down into actionable steps. Use a mix of regular paragraphs for overview and context, bullet points for general items, and numbered lists for sequential steps. Make it visually organized and easy to follow.",
+    # Bullet List format: Entire response as bullet points only
+    "Bullet List": "Please break this down into actionable steps. Format your ENTIRE response as a bullet list ONLY. Do not use paragraphs or numbered lists.",
+    # Numbered List format: Entire response as a numbered list only
+    "Numbered List": "Please break this down into actionable steps. Format your ENTIRE response as a numbered list ONLY. Do not use paragraphs or bullet points.",
+}
+
+
+def build_messages(goal, output_format="Standard"):
+    """
+    Build the chat messages sent to a model for a goal.
+    The same messages are used for every backend so drafts and final
+    answers are generated from an identical prompt.
+    """
+    instructions = FORMAT_INSTRUCTIONS.get(output_format, FORMAT_INSTRUCTIONS["Numbered List"])
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"My goal: {goal}\n{instructions}"},
+    ]
+
+
+def build_followup_messages(history, followup, output_format="Standard"):
+    """
+    Build the chat messages for a follow-up request that refines an earlier plan.
+    `history` holds the earlier turns (already compacted to fit the token budget).
+    """
+    instructions = FORMAT_INSTRUCTIONS.get(output_format, FORMAT_INSTRUCTIONS["Numbered List"])
+    instructions = instructions.replace("Please break this down into actionable steps.", "Rewrite the full plan with this change.")
+    return (
+        [{"role": "system", "content": SYSTEM_PROMPT}]
+        + list(history)
+        + [{"role": "user", "content": f"{followup}\n{instructions}"}]
+    )
+
+
+# ===================================================
+# BACKEND CALLS
+# ===================================================
+def is_openai_model(model):
+    """Returns True if the model name refers to OpenAI rather than a local Ollama model."""
+    return model == "OpenAI API" or model.lower().startswith("gpt-")
+
+
+def stream_completion(model, messages, temperature=0.7, max_tokens=300, generation=None):
+    """
+    Stream a chat completion from the selected backend.
+    Yields pieces of the response text as soon as the backend produces them.
+    If a generation (see generations.py) is given, the stream is closed when it
+    is cancelled or passes its deadline, and GenerationCancelled is raised.
+    """
+    if generation is not None:
+        generation.check()
+    if is_openai_model(model):
+        stream = openai.chat.completions.create(
+            model=OPENAI_MODEL if model == "OpenAI API" else model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            timeout=generations.timeout_for(generation, openai.NOT_GIVEN),
+        )
+        # Closing the stream drops the connection, which stops the generation at OpenAI
+        with stream, generations.cancellable(generation, stream.close):
+            for chunk in stream:
+                # Some chunks (e.g. the final one) carry no text
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+    else:
+        response = ollama_session.post(
+            f"{OLLAMA_HOST}/api/chat",
+            json={
+                "model": model,
+                "messages": messages,
+                "stream": True,
+                "options": {"temperature": temperature, "num_predict": max_tokens},
+            },
+            stream=True,
+            timeout=generations.timeout_for(generation, OLLAMA_TIMEOUT),
+        )
+        # Closing the response returns the connection to the session's pool
+        # (or, when cancelled, drops it, which makes Ollama stop generating)
+        with response, generations.cancellable(generation, response.close):
+            response.raise_for_status()
+            # Ollama streams one JSON object per line; the last one has "done" set
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                text = data.get("message", {}).get("content", "")
+                if text:
+                    yield text
+
+
+def complete(model, messages, temperature=0.7, max_tokens=300, generation=None):
+    """Run a chat completion on the selected backend and return the full response text."""
+    return "".join(stream_completion(model, messages, temperature, max_tokens, generation)).strip()
+
+
+def summarize(model, text, instructions, max_tokens=200, generation=None):
+    """Ask a model for a short summary of text, following the given instructions."""
+    messages = [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": text},
+    ]
+    return complete(model, messages, temperature=0.2, max_tokens=max_tokens, generation=generation)
+
+
+def reformat(model, text, output_format, max_tokens=400, generation=None):
+    """
+    Ask a model to rewrite text in the requested output format.
+    Used only when formatting.py cannot repair the text locally; the request
+    is short and carries no goal context, so it is much cheaper than regenerating.
+    """
+    kind = "numbered" if "numbered" in output_format.lower() else "bullet"
+    instructions = f"Rewrite the user's text as a markdown {kind} list of actionable steps. Output ONLY the list."
+    messages = [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": text},
+    ]
+    return complete(model, messages, temperature=0.0, max_tokens=max_tokens, generation=generation)
@@ -0,0 +1,465 @@
+# benchmark_models.py
+# -------------------
+# Benchmarks the configured models (backends.MODEL_OPTIONS) on a fixed corpus of
+# goals in every output format and writes the results to the leaderboard
+# (leaderboard.json, see leaderboard.py). app.py reads the leaderboard to order
+# the model picker and to pick the default model and draft model.
+#
+# Measured for every model:
+#   - time to first token (TTFT) and total latency (p50 and p95)
+#   - tokens per second after the first token (streamed chunks, about one token each)
+#   - peak resident memory of the Ollama processes while a local model runs
+#     (or, when Ollama runs elsewhere, the model size reported by /api/ps)
+#   - format compliance: the share of raw responses that already match the
+#     requested output format, before any repair (formatting.check_format)
+#   - the time the first request took, which includes loading a local model
+#
+# The backends are imported only after the environment points them at the
+# servers under test (as in load_test.py).
+# Everything runs offline: local models against Ollama, and "OpenAI API" only
+# against the mock server (--mock) or a server set with OPENAI_BASE_URL.
+#
+# Usage:
+#   python benchmark_models.py                                 # every local model Ollama has pulled
+#   python benchmark_models.py --models gemma3:1b,smollm:135m --repeats 3
+#   python benchmark_models.py --mock                          # also "OpenAI API", against the mock server
+#   python benchmark_models.py --mock --mock-ollama            # everything against the mock (checks the pipeline)
+# Runs with --mock write leaderboard.mock.json unless --output is given, so mock
+# numbers never steer the app.
+
+# --- Import required libraries ---
+import argparse   # argparse reads the benchmark settings from the command line
+import hashlib    # hashlib fingerprints the goal corpus
+import os         # os points the backends at the servers and reads /proc
+import platform   # platform describes the machine in the leaderboard
+import statistics # statistics takes the median token rate
+import sys        # sys reports errors
+import threading  # threading samples memory while a model runs
+import time       # time measures TTFT and latency
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import leaderboard
+from load_test import percentile, start_mock_server
+
+# ===================================================
+# BENCHMARK CONFIGURATION
+# ===================================================
+# The fixed goal corpus; keep it stable so leaderboard versions stay comparable
+BENCHMARK_GOALS = [
+    "Learn to play the piano",
+    "Run a marathon in under 4 hours",
+    "Start a small online business selling handmade jewelry",
+    "Build a mobile app for tracking expenses",
+    "Save enough money for a house deposit within three years while paying off my student loan",
+    "Organize a community vegetable garden for my neighborhood with volunteers, a small budget and a shared watering schedule",
+]
+
+# Output formats every goal is requested in
+BENCHMARK_FORMATS = ["Standard", "Bullet List", "Numbered List"]
+
+# Same generation settings as the apps
+TEMPERATURE = 0.7
+MAX_TOKENS = 300
+
+# Seconds one request may take (the first one also loads a local model)
+REQUEST_TIMEOUT = 120
+
+# Models failing more often than this are ranked last and never become a default
+MAX_ERROR_RATE = 0.2
+
+# Seconds between memory samples
+MEMORY_INTERVAL = 0.2
+
+# Ollama process names (as shown in /proc/<pid>/comm, cut to 15 characters)
+OLLAMA_PROCESSES = ("ollama", "llama")
+
+MOCK_OUTPUT = "leaderboard.mock.json"
+
+
+# ===================================================
+# MEMORY MEASUREMENT
+# ===================================================
+def ollama_rss_mb():
+    """Total resident memory of the local Ollama processes in MB, or None if none are visible."""
+    total, found = 0, False
+    try:
+        pids = [pid for pid in os.listdir("/proc") if pid.isdigit()]
+    except OSError:
+        return None
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/comm") as f:
+                if not f.read().strip().startswith(OLLAMA_PROCESSES):
+                    continue
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        found = True
+        except (OSError, ValueError):
+            continue
+    return total / 1024 if found else None
+
+
+class MemorySampler:
+    """Records the peak of ollama_rss_mb() in a background thread while the `with` block runs."""
+
+    def __init__(self, enabled=True, interval=MEMORY_INTERVAL):
+        self.enabled = enabled
+        self.interval = interval
+        self.peak_mb = None
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        if self.enabled:
+            self.thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            self.stopped.set()
+            self.thread.join()
+        return False
+
+    def _run(self):
+        while True:
+            rss = ollama_rss_mb()
+            if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+                self.peak_mb = rss
+            if self.stopped.wait(self.interval):
+                return
+
+
+def is_local_host(url):
+    return urlparse(url).hostname in ("localhost", "127.0.0.1", "::1")
+
+
+def machine_name():
+    """Where the benchmark ran; results from other machines are not compared."""
+    return f"{platform.node()} ({platform.system()} {platform.machine()}, {os.cpu_count()} CPUs)"
+
+
+# ===================================================
+# OLLAMA HELPERS
+# ===================================================
+def pulled_models():
+    """Names of the models Ollama has pulled, or None if Ollama is not reachable."""
+    import backends
+    try:
+        response = backends.ollama_session.get(f"{backends.OLLAMA_HOST}/api/tags", timeout=5)
+        response.raise_for_status()
+        models = response.json().get("models", [])
+    except Exception:
+        return None
+    names = set()
+    for model in models:
+        name = model.get("name", "")
+        names.update({name, name.removesuffix(":latest")})
+    return names
+
+
+def loaded_size_mb(model):
+    """Memory Ollama reports for a loaded model (/api/ps) in MB, or None."""
+    import backends
+    try:
+        response = backends.ollama_session.get(f"{backends.OLLAMA_HOST}/api/ps", timeout=5)
+        response.raise_for_status()
+        for loaded in response.json().get("models", []):
+            if model in (loaded.get("name"), loaded.get("model")):
+                return loaded.get("size", 0) / (1024 * 1024) or None
+    except Exception:
+        pass
+    return None
+
+
+def unload(model):
+    """Ask Ollama to unload a model, so the next model's memory is measured on its own."""
+    import backends
+    try:
+        backends.ollama_session.post(
+            f"{backends.OLLAMA_HOST}/api/generate", json={"model": model, "keep_alive": 0}, timeout=30
+        ).close()
+    except Exception:
+        pass
+
+
+# ===================================================
+# RUNNING THE BENCHMARK
+# ===================================================
+def timed_request(model, goal, output_format):
+    """Stream one plan; returns its TTFT, latency, token count, token rate and format compliance."""
+    import backends
+    import formatting
+    import generations
+    generation = generations.tracker.start(deadline=REQUEST_TIMEOUT)
+    pieces = []
+    first = None
+    started = time.perf_counter()
+    try:
+        messages = backends.build_messages(goal, output_format)
+        for piece in backends.stream_completion(model, messages, TEMPERATURE, MAX_TOKENS, generation):
+            if first is None:
+                first = time.perf_counter()
+            pieces.append(piece)
+    finally:
+        generations.tracker.finish(generation)
+    end = time.perf_counter()
+    # Token rate after the first token: the gaps between the remaining tokens
+    rate = (len(pieces) - 1) / (end - first) if first is not None and len(pieces) > 1 and end > first else None
+    return {
+        "format": output_format,
+        "ttft": (first or end) - started,
+        "latency": end - started,
+        "tokens": len(pieces),
+        "tokens_per_sec": rate,
+        "compliant": formatting.check_format("".join(pieces), output_format),
+    }
+
+
+def benchmark_model(model, goals, formats, repeats, measure_memory):
+    """Run the corpus through one model. Returns (runs, peak memory MB, loaded size MB, load seconds)."""
+    import backends
+    runs = []
+    with MemorySampler(enabled=measure_memory) as memory:
+        # The first request loads a local model; it is timed separately and not counted
+        started = time.perf_counter()
+        try:
+            timed_request(model, goals[0], formats[0])
+        except Exception as e:
+            return [{"format": formats[0], "error": f"{type(e).__name__}: {e}"}], None, None, None
+        load_seconds = time.perf_counter() - started
+        for repeat in range(repeats):
+            for goal in goals:
+                for output_format in formats:
+                    try:
+                        runs.append(timed_request(model, goal, output_format))
+                    except Exception as e:
+                        runs.append({"format": output_format, "error": f"{type(e).__name__}: {e}"})
+        size = None if backends.is_openai_model(model) else loaded_size_mb(model)
+    return runs, memory.peak_mb, size, load_seconds
+
+
+def summarize(model, runs, peak_mb, size_mb, load_seconds, corpus, machine):
+    """One leaderboard entry from the runs of a model."""
+    ok = [run for run in runs if "error" not in run]
+    ttfts = sorted(run["ttft"] * 1000 for run in ok)
+    latencies = sorted(run["latency"] * 1000 for run in ok)
+    rates = [run["tokens_per_sec"] for run in ok if run["tokens_per_sec"] is not None]
+    by_format = {}
+    for run in ok:
+        by_format.setdefault(run["format"], []).append(run["compliant"])
+
+    def ms(value):
+        return round(value, 1) if value is not None else None
+
+    entry = {
+        "model": model,
+        "measured_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "corpus": corpus,
+        "machine": machine,
+        "runs": len(runs),
+        "errors": len(runs) - len(ok),
+        "error_rate": round((len(runs) - len(ok)) / len(runs), 3) if runs else 1.0,
+        "ttft_ms": {"p50": ms(percentile(ttfts, 50)), "p95": ms(percentile(ttfts, 95))},
+        "latency_ms": {"p50": ms(percentile(latencies, 50)), "p95": ms(percentile(latencies, 95))},
+        "tokens_per_sec": round(statistics.median(rates), 1) if rates else None,
+        "format_compliance": round(sum(run["compliant"] for run in ok) / len(ok), 3) if ok else None,
+        "compliance_by_format": {name: round(sum(v) / len(v), 3) for name, v in by_format.items()},
+        # Measured RSS when Ollama runs on this machine, else the size Ollama reports
+        "peak_memory_mb": ms(peak_mb if peak_mb is not None else size_mb),
+        "load_ms": ms(load_seconds * 1000) if load_seconds is not None else None,
+        "last_error": next((run["error"] for run in reversed(runs) if "error" in run), None),
+    }
+    # Read by leaderboard.py: unusable models are listed after unmeasured ones
+    entry["usable"] = usable(entry)
+    return entry
+
+
+# ===================================================
+# RANKING
+# ===================================================
+def usable(entry):
+    return entry["error_rate"] <= MAX_ERROR_RATE and entry["format_compliance"] is not None
+
+
+def rank_key(entry):
+    """
+    Usable models first, then by format compliance (in steps of 10%, so small
+    differences do not outweigh speed), then by median total latency.
+    """
+    latency = entry["latency_ms"]["p50"]
+    return (
+        not usable(entry),
+        -round(entry["format_compliance"] or 0, 1),
+        latency if latency is not None else float("inf"),
+    )
+
+
+def choose_defaults(entries, model_options, draft_options):
+    """
+    The best usable model, and the draft candidate with the lowest median TTFT.
+    Draft models are only made the default model if no other model is usable.
+    If the built-in default (model_options[0]) was not benchmarked, no default
+    model is set, so the apps keep the built-in one rather than preferring a
+    model it was never compared with (e.g. "OpenAI API" without --mock).
+    """
+    ranked = [entry for entry in entries if usable(entry)]
+    defaults = {}
+    if any(entry["model"] == model_options[0] for entry in entries):
+        main_choices = [entry["model"] for entry in ranked if entry["model"] in model_options]
+        full_models = [model for model in main_choices if model not in draft_options]
+        if main_choices:
+            defaults["model"] = (full_models or main_choices)[0]
+    drafts = [entry for entry in ranked if entry["model"] in draft_options and entry["ttft_ms"]["p50"] is not None]
+    if drafts:
+        defaults["draft_model"] = min(drafts, key=lambda entry: entry["ttft_ms"]["p50"])["model"]
+    return defaults
+
+
+def _seconds(ms):
+    return f"{ms / 1000:.2f}s" if ms is not None else "-"
+
+
+def print_table(entries):
+    print(f"\n{'rank':>4}  {'model':<30} {'TTFT p50':>9} {'total p50':>10} {'total p95':>10} "
+          f"{'tok/s':>7} {'format':>7} {'memory':>9} {'errors':>7}")
+    for rank, entry in enumerate(entries, 1):
+        rate = f"{entry['tokens_per_sec']:.0f}" if entry["tokens_per_sec"] is not None else "-"
+        compliance = f"{entry['format_compliance']:.0%}" if entry["format_compliance"] is not None else "-"
+        memory = f"{entry['peak_memory_mb']:.0f} MB" if entry["peak_memory_mb"] is not None else "-"
+        print(
+            f"{rank:>4}  {entry['model']:<30} {_seconds(entry['ttft_ms']['p50']):>9} "
+            f"{_seconds(entry['latency_ms']['p50']):>10} {_seconds(entry['latency_ms']['p95']):>10} "
+            f"{rate:>7} {compliance:>7} {memory:>9} {entry['errors']:>7}"
+        )
+
+
+# ===================================================
+# MAIN
+# ===================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the configured models and update the leaderboard.")
+    parser.add_argument("--models", default=None,
+                        help="comma separated models (default: every entry of backends.MODEL_OPTIONS)")
+    parser.add_argument("--formats", default=",".join(BENCHMARK_FORMATS), help="comma separated output formats")
+    parser.add_argument("--goals", default=None, help="file with one goal per line instead of the built-in corpus")
+    parser.add_argument("--repeats", type=int, default=1, help="times the corpus is run per model")
+    parser.add_argument("--output", default=None,
+                        help=f"leaderboard file (default: {leaderboard.LEADERBOARD_PATH}, or {MOCK_OUTPUT} with --mock)")
+    parser.add_argument("--mock", action="store_true", help="benchmark \"OpenAI API\" against mock_llm_server.py")
+    parser.add_argument("--mock-ollama", action="store_true", help="also send Ollama traffic to the mock server")
+    mock = parser.add_argument_group("mock server behavior")
+    mock.add_argument("--mock-latency", type=float, default=0.2)
+    mock.add_argument("--mock-token-rate", type=float, default=200.0)
+    mock.add_argument("--mock-tokens", type=int, default=60)
+    parser.set_defaults(mock_error_rate=0.0, mock_rate_limit_rate=0.0, mock_max_concurrency=0)
+    args = parser.parse_args(argv)
+    if args.mock_ollama:
+        args.mock = True
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    process = None
+    if args.mock:
+        process, url = start_mock_server(args)
+        os.environ["OPENAI_BASE_URL"] = url + "/v1"
+        os.environ["OPENAI_API_KEY"] = "mock-key"
+        if args.mock_ollama:
+            os.environ["OLLAMA_HOST"] = url
+        print(f"Mock server: {url}")
+
+    # Imported only now, so the backends use the servers configured above
+    import backends
+    from warm_cache import read_seed_goals
+
+    try:
+        goals = read_seed_goals(args.goals) if args.goals else BENCHMARK_GOALS
+        if not goals:
+            sys.exit(f"No goals in {args.goals}")
+        formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+        models = [name.strip() for name in args.models.split(",")] if args.models else list(backends.MODEL_OPTIONS)
+        corpus = {
+            "goals": len(goals),
+            "formats": formats,
+            "repeats": args.repeats,
+            "fingerprint": hashlib.sha256("\n".join(goals).encode("utf-8")).hexdigest()[:12],
+        }
+
+        pulled = None if args.mock_ollama else pulled_models()
+        # Process memory can only be read when Ollama runs on this machine (and is not the mock)
+        measure_memory = not args.mock_ollama and is_local_host(backends.OLLAMA_HOST)
+        machine = machine_name()
+        entries = []
+        for model in models:
+            if backends.is_openai_model(model):
+                if not (args.mock or os.environ.get("OPENAI_BASE_URL")):
+                    print(f"skip {model}: runs only against --mock or OPENAI_BASE_URL, to stay offline")
+                    continue
+            elif not args.mock_ollama:
+                if pulled is None:
+                    print(f"skip {model}: Ollama is not reachable at {backends.OLLAMA_HOST}")
+                    continue
+                if model not in pulled:
+                    print(f"skip {model}: not pulled (ollama pull {model})")
+                    continue
+            print(f"benchmarking {model} ({len(goals) * len(formats) * args.repeats} requests)...", flush=True)
+            runs, peak_mb, size_mb, load_seconds = benchmark_model(
+                model, goals, formats, args.repeats, measure_memory and not backends.is_openai_model(model)
+            )
+            if not backends.is_openai_model(model) and not args.mock_ollama:
+                unload(model)
+            entry = summarize(model, runs, peak_mb, size_mb, load_seconds, corpus, machine)
+            if entry["last_error"]:
+                print(f"  {entry['errors']} of {entry['runs']} requests failed, last: {entry['last_error']}")
+            entries.append(entry)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if not entries:
+        sys.exit("No model could be benchmarked.")
+
+    # Models not measured this time keep their earlier results, but only results
+    # of the same corpus on the same machine are comparable; others are dropped
+    output = args.output or (MOCK_OUTPUT if args.mock else leaderboard.LEADERBOARD_PATH)
+    measured = {entry["model"] for entry in entries}
+    previous = leaderboard.load(output) or {}
+    earlier = [entry for entry in previous.get("models", []) if entry.get("model") not in measured]
+    kept = [entry for entry in earlier if entry.get("corpus") == corpus and entry.get("machine") == machine]
+    if len(kept) < len(earlier):
+        dropped = ", ".join(entry.get("model", "?") for entry in earlier if entry not in kept)
+        print(f"Dropped earlier results measured with another corpus or on another machine: {dropped}")
+    entries += kept
+    entries.sort(key=rank_key)
+
+    board = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "mock": args.mock,
+            "mock_ollama": args.mock_ollama,
+            "ollama_host": backends.OLLAMA_HOST,
+            "openai_base_url": os.environ.get("OPENAI_BASE_URL"),
+            "machine": machine,
+            "python": platform.python_version(),
+        },
+        "corpus": corpus,
+        "defaults": choose_defaults(entries, backends.MODEL_OPTIONS, backends.DRAFT_MODEL_OPTIONS),
+        "models": entries,
+    }
+    version = leaderboard.save(board, output)
+    print_table(entries)
+    defaults = board["defaults"]
+    default = defaults.get("model", f"{backends.MODEL_OPTIONS[0]} (built-in, not benchmarked)")
+    print(f"\nWrote {output} (version {version}); default model: {default}, "
+          f"draft model: {defaults.get('draft_model', '-')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+# cassettes.py
+# ------------
+# Record/replay of backend HTTP traffic ("cassettes") for offline, deterministic runs.
+# In record mode every request the apps send to OpenAI or Ollama is stored together
+# with its response, including each streamed chunk and when it arrived.
+# In replay mode the stored responses are served back without touching the network,
+# either at the original speed or as fast as possible.
+#
+# Enable it with environment variables before starting an app:
+#   LLM_CASSETTE=cassettes/demo.cassette   path of the cassette file
+#   LLM_CASSETTE_MODE=record               "record" or "replay"
+#   LLM_REPLAY_SPEED=fast                  "realtime" (default) or "fast" (replay only)
+#
+# File layout: the cassette is a JSON-lines file with one interaction per line, and a
+# sidecar "<cassette>.idx" maps each request key to the byte offsets of its
+# interactions, so replay reads only the lines it needs.
+# Streams that were closed early (cancelled, or a progressive-mode draft cut
+# short) are recorded as "partial" and indexed under "<key>#partial"; they are
+# replayed only for requests that have no complete recording.
+# Inspect a cassette with:  python cassettes.py cassettes/demo.cassette
+
+# --- Import required libraries ---
+import base64     # base64 stores chunks that are not valid UTF-8 text
+import hashlib    # hashlib builds a stable key for each request
+import json       # json encodes interactions and the index
+import os         # os reads the configuration and replaces the index atomically
+import sys        # sys reads the command line of the inspection tool
+import threading  # threading guards the cassette file between concurrent requests
+import time       # time measures and reproduces chunk timing
+from urllib.parse import urlsplit
+
+import httpx      # httpx is the HTTP library used by the openai package
+import requests   # requests is the HTTP library used for Ollama
+
+
+# Index entries of partial recordings carry this suffix after the request key
+PARTIAL_SUFFIX = "#partial"
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a request has no recorded interaction."""
+
+
+# ===================================================
+# CASSETTE FILE
+# ===================================================
+class Cassette:
+    """A cassette file plus its offset index. Safe to share between threads."""
+
+    def __init__(self, path, mode="replay", speed="realtime"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        self.path = path
+        self.index_path = path + ".idx"
+        self.mode = mode
+        self.realtime = speed != "fast"
+        self.lock = threading.Lock()
+        self.index = self._load_index()
+        # Replay cycles through repeated recordings of the same request in order
+        self.positions = {}
+
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                return json.load(f)
+        index = {}
+        # No index yet: rebuild it by scanning the cassette once
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        index.setdefault(index_key(record["key"], not record.get("partial")), []).append(offset)
+                    offset += len(line)
+        return index
+
+    def _save_index(self):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.index, f, separators=(",", ":"))
+        os.replace(temp_path, self.index_path)
+
+    @staticmethod
+    def key_for(method, url, body):
+        """
+        Stable key for a request: method, path and (canonical JSON) body.
+        The host is left out so a recording of the real API also replays
+        against a local mock, and headers are left out so API keys never matter.
+        """
+        parts = urlsplit(str(url))
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        if isinstance(body, str):
+            body = body.encode()
+        try:
+            body = json.dumps(json.loads(body or b"null"), sort_keys=True, separators=(",", ":")).encode()
+        except ValueError:
+            pass
+        digest = hashlib.sha256(method.upper().encode() + b" " + target.encode() + b"\n" + (body or b""))
+        return digest.hexdigest()[:24]
+
+    def save(self, key, request_info, status, headers, wait, chunks, complete=True):
+        """Append one interaction and update the index."""
+        record = {
+            "key": key,
+            "request": request_info,
+            "status": status,
+            "headers": headers,
+            "wait": round(wait, 4),
+            "chunks": [[round(delay, 4), encode_chunk(data)] for delay, data in chunks],
+        }
+        if not complete:
+            record["partial"] = True
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+            self.index.setdefault(index_key(key, complete), []).append(offset)
+            self._save_index()
+
+    def load(self, key):
+        """
+        Return the next recorded interaction for key (cycling through repeats).
+        Partial recordings are used only when the request has no complete one.
+        """
+        with self.lock:
+            if not self.index.get(key):
+                key = index_key(key, complete=False)
+            offsets = self.index.get(key)
+            if not offsets:
+                raise CassetteMissError(f"No recorded interaction for request {key} in {self.path}")
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            with open(self.path, "rb") as f:
+                f.seek(offsets[position % len(offsets)])
+                record = json.loads(f.readline())
+        record["chunks"] = [(delay, decode_chunk(data)) for delay, data in record["chunks"]]
+        return record
+
+    def replay_chunks(self, chunks):
+        """Yield recorded chunk bytes, sleeping between them in realtime mode."""
+        for delay, data in chunks:
+            if self.realtime and delay > 0:
+                time.sleep(delay)
+            yield data
+
+
+def index_key(key, complete=True):
+    """The index entry of a request's complete or partial recordings."""
+    return key if complete else key + PARTIAL_SUFFIX
+
+
+def encode_chunk(data):
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(data).decode("ascii")}
+
+
+def decode_chunk(data):
+    if isinstance(data, dict):
+        return base64.b64decode(data["b64"])
+    return data.encode("utf-8")
+
+
+class ChunkRecorder:
+    """Collects (delay since previous chunk, bytes) pairs and saves them once, when the response ends."""
+
+    def __init__(self, cassette, key, request_info, status, headers, started):
+        self.cassette = cassette
+        self.key = key
+        self.request_info = request_info
+        self.status = status
+        self.headers = headers
+        self.last = time.monotonic()
+        self.wait = self.last - started
+        self.chunks = []
+        self.saved = False
+
+    def add(self, data):
+        now = time.monotonic()
+        self.chunks.append((now - self.last, data))
+        self.last = now
+
+    def finish(self, complete=True):
+        if not self.saved:
+            self.saved = True
+            self.cassette.save(self.key, self.request_info, self.status, self.headers, self.wait, self.chunks, complete)
+
+
+# ===================================================
+# OPENAI (HTTPX) TRANSPORT
+# ===================================================
+class RecordingByteStream(httpx.SyncByteStream):
+    def __init__(self, stream, recorder):
+        self.stream = stream
+        self.recorder = recorder
+
+    def __iter__(self):
+        for data in self.stream:
+            self.recorder.add(data)
+            yield data
+        self.recorder.finish()
+
+    def close(self):
+        self.stream.close()
+        # Closed before the end (e.g. cancelled): keep what arrived, marked partial
+        self.recorder.finish(complete=False)
+
+
+class ReplayByteStream(httpx.SyncByteStream):
+    def __init__(self, cassette, chunks):
+        self.cassette = cassette
+        self.chunks = chunks
+
+    def __iter__(self):
+        yield from self.cassette.replay_chunks(self.chunks)
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records to or replays from a cassette."""
+
+    def __init__(self, cassette, transport=None):
+        self.cassette = cassette
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request):
+        body = request.read()
+        key = Cassette.key_for(request.method, request.url, body)
+        if self.cassette.mode == "replay":
+            record = self.cassette.load(key)
+            if self.cassette.realtime:
+                time.sleep(record["wait"])
+            return httpx.Response(
+                record["status"],
+                headers=record["headers"],
+                stream=ReplayByteStream(self.cassette, record["chunks"]),
+                request=request,
+            )
+        started = time.monotonic()
+        response = self.transport.handle_request(request)
+        recorder = ChunkRecorder(
+            self.cassette, key, {"method": request.method, "url": str(request.url)},
+            response.status_code, response.headers.multi_items(), started,
+        )
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=RecordingByteStream(response.stream, recorder),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    def close(self):
+        self.transport.close()
+
+
+# ===================================================
+# OLLAMA (REQUESTS) ADAPTER
+# ===================================================
+# Headers describing the raw body; requests hands us decoded bytes, so these
+# no longer apply to what is stored
+RAW_BODY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class RecordingRaw:
+    """Wraps a urllib3 response so everything read from it is also recorded."""
+
+    def __init__(self, raw, recorder):
+        self.raw = raw
+        self.recorder = recorder
+
+    def stream(self, amt=2 ** 16, decode_content=True):
+        for data in self.raw.stream(amt, decode_content=True):
+            self.recorder.add(data)
+            yield data
+        self.recorder.finish()
+
+    def read(self, amt=None, decode_content=True, **kwargs):
+        data = self.raw.read(amt, decode_content=True)
+        if data:
+            self.recorder.add(data)
+        if not data or amt is None:
+            self.recorder.finish()
+        return data
+
+    def close(self):
+        self.recorder.finish(complete=False)
+        self.raw.close()
+
+    def release_conn(self):
+        self.raw.release_conn()
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class ReplayRaw:
+    """A minimal file-like body serving recorded chunks to requests."""
+
+    def __init__(self, cassette, chunks):
+        self.chunks = cassette.replay_chunks(chunks)
+        self.closed = False
+
+    def stream(self, amt=2 ** 16, decode_content=True):
+        yield from self.chunks
+
+    def read(self, amt=None, decode_content=True, **kwargs):
+        # Chunks are returned whole; callers loop until b"" is returned
+        if amt is None:
+            return b"".join(self.chunks)
+        return next(self.chunks, b"")
+
+    def close(self):
+        self.closed = True
+
+    def release_conn(self):
+        pass
+
+
+class CassetteAdapter(requests.adapters.HTTPAdapter):
+    """requests adapter that records to or replays from a cassette."""
+
+    def __init__(self, cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = Cassette.key_for(request.method, request.url, request.body)
+        if self.cassette.mode == "replay":
+            record = self.cassette.load(key)
+            if self.cassette.realtime:
+                time.sleep(record["wait"])
+            response = requests.Response()
+            response.status_code = record["status"]
+            response.headers = requests.structures.CaseInsensitiveDict(record["headers"])
+            response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+            response.raw = ReplayRaw(self.cassette, record["chunks"])
+            response.url = request.url
+            response.request = request
+            response.connection = self
+        else:
+            started = time.monotonic()
+            response = super().send(request, stream=True, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in RAW_BODY_HEADERS]
+            recorder = ChunkRecorder(
+                self.cassette, key, {"method": request.method, "url": request.url},
+                response.status_code, headers, started,
+            )
+            response.raw = RecordingRaw(response.raw, recorder)
+        if not stream:
+            response.content  # Read the whole body now, like requests does
+        return response
+
+
+# ===================================================
+# INSTALLATION
+# ===================================================
+def install(cassette, ollama_session):
+    """Route the openai module client and the Ollama session through a cassette."""
+    import openai
+    client_class = getattr(openai, "DefaultHttpxClient", httpx.Client)
+    openai.http_client = client_class(transport=CassetteTransport(cassette))
+    adapter = CassetteAdapter(cassette, pool_maxsize=64)
+    ollama_session.mount("http://", adapter)
+    ollama_session.mount("https://", adapter)
+
+
+def install_from_env(ollama_session):
+    """Install a cassette if LLM_CASSETTE is set. Returns the cassette or None."""
+    path = os.environ.get("LLM_CASSETTE")
+    if not path:
+        return None
+    cassette = Cassette(
+        path,
+        mode=os.environ.get("LLM_CASSETTE_MODE", "replay"),
+        speed=os.environ.get("LLM_REPLAY_SPEED", "realtime"),
+    )
+    install(cassette, ollama_session)
+    return cassette
+
+
+# ===================================================
+# INSPECTION TOOL
+# ===================================================
+def describe(path):
+    """Print one line per recorded interaction."""
+    cassette = Cassette(path, "replay", "fast")
+    print(f"{path}: {sum(len(v) for v in cassette.index.values())} interactions, {len({k.removesuffix(PARTIAL_SUFFIX) for k in cassette.index})} distinct requests")
+    with open(path, "rb") as f:
+        for line in f:
+            record = json.loads(line)
+            streamed = sum(delay for delay, _ in record["chunks"])
+            size = sum(len(decode_chunk(data)) for _, data in record["chunks"])
+            print(
+                f"  {record['key']}  {record['request']['method']} {urlsplit(record['request']['url']).path}"
+                f"  {record['status']}  wait={record['wait']:.3f}s  stream={streamed:.3f}s"
+                f"  {len(record['chunks'])} chunks / {size} bytes{'  (partial)' if record.get('partial') else ''}"
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python cassettes.py <cassette file>")
+        sys.exit(1)
+    describe(sys.argv[1])
@@ -0,0 +1,100 @@
+# conversation.py
+# ---------------
+# Plan history for follow-up ("refine this plan") conversations.
+# Every follow-up resends the earlier turns so the model knows what it is
+# refining. To stop that history from growing without limit, older turns are
+# folded into a single summary message whenever the prompt would exceed a
+# fixed token budget, so each follow-up costs about the same however long the
+# conversation has run.
+
+# ===================================================
+# CONFIGURATION
+# ===================================================
+# Upper bound (estimated tokens) for the history sent with each follow-up
+HISTORY_TOKEN_BUDGET = 1200
+
+# Number of most recent messages that are always kept word for word
+# (two messages = the last follow-up and the plan it produced)
+KEEP_RECENT_MESSAGES = 2
+
+# Prefix that marks the summary message at the start of a compacted history
+SUMMARY_PREFIX = "Summary of the conversation so far:\n"
+
+# Instructions given to the model when it summarizes older turns
+SUMMARY_INSTRUCTIONS = (
+    "Summarize this planning conversation for your own later reference. "
+    "Keep the user's goal, every constraint or change they asked for, and the key steps of the latest plan. "
+    "Be brief and use plain sentences."
+)
+
+
+# ===================================================
+# TOKEN ESTIMATES
+# ===================================================
+def estimate_tokens(text):
+    """
+    Rough token count for a piece of text (about 4 characters per token for English).
+    Good enough for budgeting without loading a tokenizer.
+    """
+    return max(1, (len(text) + 3) // 4)
+
+
+def history_tokens(messages):
+    """Estimated tokens for a list of chat messages, including per-message overhead."""
+    return sum(estimate_tokens(m["content"]) + 4 for m in messages)
+
+
+def truncate_to_tokens(text, budget):
+    """Cut text down to roughly `budget` tokens, keeping the beginning."""
+    limit = budget * 4
+    if len(text) <= limit:
+        return text
+    return text[:max(0, limit - 3)].rstrip() + "..."
+
+
+# ===================================================
+# HISTORY COMPACTION
+# ===================================================
+def compact_history(history, summarize, budget=HISTORY_TOKEN_BUDGET, keep_recent=KEEP_RECENT_MESSAGES):
+    """
+    Return a history that fits in `budget` estimated tokens.
+
+    history    -- list of {"role", "content"} messages, oldest first (no system message)
+    summarize  -- function(text) -> summary text, usually a cheap model call;
+                  if it fails, a plain truncation of the old turns is used instead
+
+    If the history already fits it is returned unchanged. Otherwise every
+    message except the `keep_recent` newest ones is folded into a single
+    summary message (an earlier summary is folded in too, so compaction is
+    incremental). The returned list should replace the stored history so the
+    same turns are never summarized twice.
+    """
+    if history_tokens(history) <= budget:
+        return history
+
+    older, recent = history[:-keep_recent], history[-keep_recent:]
+    if older:
+        transcript = "\n\n".join(
+            m["content"][len(SUMMARY_PREFIX):] if m["content"].startswith(SUMMARY_PREFIX)
+            else f"{m['role'].upper()}: {m['content']}"
+            for m in older
+        )
+        # The summary may use whatever the recent messages leave over
+        summary_budget = max(100, budget - history_tokens(recent) - 4)
+        try:
+            summary = summarize(transcript).strip()
+        except Exception:
+            summary = ""
+        summary = truncate_to_tokens(summary or transcript, summary_budget)
+        history = [{"role": "system", "content": SUMMARY_PREFIX + summary}] + recent
+    else:
+        history = list(recent)
+
+    # Last resort: very long recent messages are shortened, oldest first
+    for i, message in enumerate(history):
+        over = history_tokens(history) - budget
+        if over <= 0:
+            break
+        keep = max(50, estimate_tokens(message["content"]) - over)
+        history[i] = dict(message, content=truncate_to_tokens(message["content"], keep))
+    return history
@@ -0,0 +1,203 @@
+# formatting.py
+# -------------
+# Checks that a model's answer matches the output format the user picked and,
+# where possible, fixes it locally instead of paying for another full call.
+#   - "Bullet List":   every top-level line must be a bullet ("- step")
+#   - "Numbered List": every top-level line must be a numbered step ("1. step")
+#   - "Standard":      anything goes
+# Repairs convert numbered steps to bullets (and back), drop headings and
+# intro/summary paragraphs around a list, and split plain paragraphs into
+# steps. Only when nothing usable can be extracted is the model asked again,
+# with a short "reformat this" request rather than the original prompt.
+
+# --- Import required libraries ---
+import re  # re recognizes markdown list items and headings
+
+# ===================================================
+# FORMAT NAMES
+# ===================================================
+# The apps use slightly different labels for the same formats
+FORMAT_ALIASES = {
+    "standard": "standard",
+    "full text": "standard",
+    "bullet list": "bullet",
+    "bullet": "bullet",
+    "bullet points": "bullet",
+    "bullets": "bullet",
+    "numbered list": "numbered",
+    "numbered": "numbered",
+}
+
+
+def normalize_format(output_format):
+    """Map any of the apps' format labels to "standard", "bullet" or "numbered"."""
+    return FORMAT_ALIASES.get(output_format.strip().lower(), "standard")
+
+
+# ===================================================
+# MARKDOWN PARSING
+# ===================================================
+BULLET_RE = re.compile(r"^[-*+•]\s+(.*)$")
+NUMBERED_RE = re.compile(r"^(?:\d+[.)]|step\s+\d+[:.)])\s+(.*)$", re.IGNORECASE)
+HEADING_RE = re.compile(r"^(#{1,6}\s+.*|\*\*[^*]+\*\*:?|__[^_]+__:?)$")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9])")
+
+
+def parse_lines(text):
+    """
+    Classify each line of markdown text.
+    Returns a list of (kind, indent, content) where kind is one of
+    "bullet", "numbered", "heading", "text" or "blank".
+    """
+    lines = []
+    for raw in text.splitlines():
+        if not raw.strip():
+            lines.append(("blank", 0, ""))
+            continue
+        indent = len(raw) - len(raw.lstrip())
+        line = raw.strip()
+        match = BULLET_RE.match(line)
+        if match:
+            lines.append(("bullet", indent, match.group(1).strip()))
+            continue
+        match = NUMBERED_RE.match(line)
+        if match:
+            lines.append(("numbered", indent, match.group(1).strip()))
+            continue
+        if HEADING_RE.match(line):
+            lines.append(("heading", indent, line.strip("#*_: ")))
+            continue
+        lines.append(("text", indent, line))
+    return lines
+
+
+def check_format(text, output_format):
+    """Returns True if text already matches the requested output format."""
+    wanted = normalize_format(output_format)
+    if wanted == "standard":
+        return bool(text.strip())
+    top_level = [kind for kind, indent, _ in parse_lines(text) if kind != "blank" and indent == 0]
+    return bool(top_level) and all(kind == wanted for kind in top_level)
+
+
+# ===================================================
+# LOCAL REPAIR
+# ===================================================
+def parent_kind(kinds):
+    """
+    When a response mixes numbered items and bullets at the top level, decide
+    which kind is the steps. The other kind comes in runs below the steps
+    ("1. Research:" followed by "- do a", "- do b"), so the kind with the
+    shorter runs is the parent; on a tie the kind used first wins.
+    """
+    runs = {"bullet": [], "numbered": []}
+    previous = None
+    for kind in kinds:
+        if kind == previous:
+            runs[kind][-1] += 1
+        else:
+            runs[kind].append(1)
+        previous = kind
+    if not runs["bullet"] or not runs["numbered"]:
+        return kinds[0]
+    average = {kind: sum(lengths) / len(lengths) for kind, lengths in runs.items()}
+    if average["bullet"] == average["numbered"]:
+        return kinds[0]
+    return min(average, key=average.get)
+
+
+def extract_steps(text):
+    """
+    Pull the steps out of a response as a list of (step text, [nested lines]).
+    List items win: when the text has any, surrounding headings and intro or
+    summary paragraphs are dropped. If numbered items and bullets are mixed,
+    the items of the other kind below a step become its nested lines.
+    Otherwise paragraphs are split into sentences, one step each.
+    """
+    lines = parse_lines(text)
+    kinds = [kind for kind, indent, _ in lines if kind in ("bullet", "numbered") and indent == 0]
+    if kinds:
+        parent = parent_kind(kinds)
+        steps = []
+        in_item = False   # the last line was a step (or its wrapped text)
+        in_child = False  # the last line was a nested item of the other kind (or its wrapped text)
+        under_step = False  # a step of the parent kind came before, with no heading since
+        for kind, indent, content in lines:
+            if kind in ("bullet", "numbered") and indent == 0:
+                if kind != parent and under_step:
+                    # A sub-task written without indentation
+                    steps[-1][1].append((kind, content))
+                    in_item, in_child = False, True
+                else:
+                    steps.append([content, []])
+                    in_item, in_child, under_step = True, False, kind == parent
+            elif kind == "heading":
+                in_item = in_child = under_step = False
+            elif kind == "blank":
+                in_item = in_child = False
+            elif steps and indent > 0:
+                # Nested items and indented continuation lines stay with their step
+                steps[-1][1].append((kind, content))
+            elif in_child:
+                # A wrapped line directly below a nested item belongs to that item
+                nested_kind, nested = steps[-1][1][-1]
+                steps[-1][1][-1] = (nested_kind, nested + " " + content)
+            elif in_item:
+                # A wrapped line directly below an item belongs to that item
+                steps[-1][0] += " " + content
+            # Anything else is an intro or summary paragraph and is dropped
+        return [tuple(step) for step in steps]
+    sentences = []
+    for kind, _, content in lines:
+        if kind in ("text", "heading"):
+            sentences.extend(s.strip() for s in SENTENCE_RE.split(content) if s.strip())
+    return [(sentence, []) for sentence in sentences]
+
+
+def render_steps(steps, output_format):
+    """Render extracted steps as a bullet or numbered markdown list."""
+    wanted = normalize_format(output_format)
+    out = []
+    for number, (step, nested) in enumerate(steps, start=1):
+        out.append(f"{number}. {step}" if wanted == "numbered" else f"- {step}")
+        for kind, content in nested:
+            out.append(f"   - {content}" if kind in ("bullet", "numbered") else f"   {content}")
+    return "\n".join(out)
+
+
+def repair_format(text, output_format):
+    """
+    Convert text to the requested format locally.
+    Returns the repaired text, or None if no usable steps could be found.
+    """
+    if normalize_format(output_format) == "standard":
+        return text
+    steps = extract_steps(text)
+    # A single sentence is not a plan; let the caller ask again
+    if len(steps) < 2:
+        return None
+    return render_steps(steps, output_format)
+
+
+def ensure_format(text, output_format, reask=None):
+    """
+    Make sure text matches the requested output format.
+
+    The text is returned unchanged when it already matches, repaired locally
+    when possible, and only as a last resort passed to `reask(text)` (a short
+    "reformat this" model call). Returns the best text available.
+    """
+    if check_format(text, output_format):
+        return text
+    repaired = repair_format(text, output_format)
+    if repaired is not None:
+        return repaired
+    if reask is not None:
+        try:
+            retried = reask(text)
+        except Exception:
+            return text
+        if check_format(retried, output_format):
+            return retried
+        return repair_format(retried, output_format) or retried
+    return text
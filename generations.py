@@ -0,0 +1,216 @@
+# generations.py
+# --------------
+# Tracks in-flight generations so that work nobody is waiting for is stopped.
+# A "generation" is everything one request sends to the backends (the main
+# call, a progressive-mode draft, long-input summaries, a reformat request).
+# It is cancelled, and its open backend streams are closed, when:
+#   - the same browser session submits again (the old request is superseded)
+#   - the browser session ends (tab closed)
+#   - its deadline passes (GOAL_REQUEST_DEADLINE seconds, default 120)
+#   - the request finishes while a call is still running in the background
+#     (e.g. the selected model missed its progressive-mode deadline)
+# Closing the HTTP response drops the connection, which also tells the backend
+# (OpenAI or Ollama) to stop generating tokens for it.
+#
+# Backend calls take the generation as an optional argument:
+#   generation = generations.tracker.start(session_id)
+#   backends.complete(model, messages, generation=generation)
+
+# --- Import required libraries ---
+import os         # os reads the default deadline
+import threading  # threading runs the janitor that enforces deadlines
+import time       # time measures deadlines
+
+# ===================================================
+# CONFIGURATION
+# ===================================================
+# Seconds a request may run before its backend calls are aborted (0 = no deadline)
+REQUEST_DEADLINE = float(os.environ.get("GOAL_REQUEST_DEADLINE", "120"))
+
+# How often the janitor checks deadlines and sessions
+JANITOR_INTERVAL = 0.5
+
+
+class GenerationCancelled(Exception):
+    """Raised by backend calls whose generation was cancelled (superseded, session ended, deadline)."""
+
+
+# ===================================================
+# ONE GENERATION
+# ===================================================
+class Generation:
+    """Cancellation state of one request, plus the closers of its open backend streams."""
+
+    def __init__(self, session_id=None, deadline=None):
+        self.session_id = session_id
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline if deadline else None
+        self.reason = None
+        self.closers = []
+        self.lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason="cancelled"):
+        """Mark the generation cancelled and close every open backend stream."""
+        with self.lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            closers, self.closers = self.closers, []
+        for close in closers:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def check(self):
+        """Raise GenerationCancelled if the generation was cancelled or is past its deadline."""
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        if self.reason is not None:
+            raise GenerationCancelled(self.reason)
+
+    def register(self, close):
+        """Remember how to abort an open stream. Closes it right away if already cancelled."""
+        with self.lock:
+            if self.reason is None:
+                self.closers.append(close)
+                return
+        close()
+
+    def unregister(self, close):
+        with self.lock:
+            if close in self.closers:
+                self.closers.remove(close)
+
+
+class _Cancellable:
+    """Context manager used by backends around one open stream."""
+
+    def __init__(self, generation, close):
+        self.generation = generation
+        self.close = close
+
+    def __enter__(self):
+        self.generation.register(self.close)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.generation.unregister(self.close)
+        # A closed stream may end with a read error or just stop early;
+        # either way the caller must learn that the text is incomplete
+        if self.generation.cancelled and exc_type is not GeneratorExit:
+            raise GenerationCancelled(self.generation.reason) from exc
+        return False
+
+
+class _NotCancellable:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOT_CANCELLABLE = _NotCancellable()
+
+
+def cancellable(generation, close):
+    """Context manager tying an open stream to a generation (does nothing without one)."""
+    if generation is None:
+        return NOT_CANCELLABLE
+    return _Cancellable(generation, close)
+
+
+def timeout_for(generation, default):
+    """The transport timeout for a call: the default, shortened to the generation's deadline."""
+    remaining = generation.remaining() if generation is not None else None
+    if remaining is None:
+        return default
+    remaining = max(0.1, remaining)
+    return min(default, remaining) if isinstance(default, (int, float)) else remaining
+
+
+# ===================================================
+# TRACKER
+# ===================================================
+class GenerationTracker:
+    """
+    Keeps the live generations, at most one per session, and runs a janitor
+    thread that cancels generations past their deadline or whose session ended.
+    """
+
+    def __init__(self, interval=JANITOR_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.live = set()
+        self.by_session = {}
+        self.is_active_session = None
+        self.janitor = None
+
+    def start(self, session_id=None, deadline=REQUEST_DEADLINE):
+        """Start tracking a new generation; an older one of the same session is cancelled."""
+        generation = Generation(session_id, deadline)
+        with self.lock:
+            previous = self.by_session.get(session_id) if session_id is not None else None
+            if session_id is not None:
+                self.by_session[session_id] = generation
+            self.live.add(generation)
+            if self.janitor is None:
+                self.janitor = threading.Thread(target=self._run, name="generation-janitor", daemon=True)
+                self.janitor.start()
+        if previous is not None:
+            previous.cancel("superseded by a newer request")
+        return generation
+
+    def finish(self, generation):
+        """The request is done: abort anything it left running and stop tracking it."""
+        generation.cancel("request finished")
+        with self.lock:
+            self.live.discard(generation)
+            if self.by_session.get(generation.session_id) is generation:
+                del self.by_session[generation.session_id]
+
+    def watch_sessions(self, is_active_session):
+        """Cancel generations whose session_id makes is_active_session(session_id) return False."""
+        self.is_active_session = is_active_session
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self.lock:
+                generations = list(self.live)
+            for generation in generations:
+                if generation.cancelled:
+                    self._forget(generation)
+                elif generation.deadline is not None and now >= generation.deadline:
+                    generation.cancel("deadline exceeded")
+                    self._forget(generation)
+                elif generation.session_id is not None and self.is_active_session is not None:
+                    try:
+                        active = self.is_active_session(generation.session_id)
+                    except Exception:
+                        active = True
+                    if not active:
+                        generation.cancel("session ended")
+                        self._forget(generation)
+
+    def _forget(self, generation):
+        with self.lock:
+            self.live.discard(generation)
+            if self.by_session.get(generation.session_id) is generation:
+                del self.by_session[generation.session_id]
+
+
+# The process-wide tracker shared by the apps
+tracker = GenerationTracker()
@@ -0,0 +1,79 @@
+# goal_client.py
+# --------------
+# Thin command line client for the goal planner daemon (python main.py --serve).
+# It only uses the standard library's socket and json modules, so it starts in
+# milliseconds; the daemon keeps openai, the connection pools and the caches warm.
+#
+# Usage:
+#   python main.py --serve &
+#   python goal_client.py "Learn conversational Spanish" --format "Bullet List"
+#   python goal_client.py - < goals.txt      # one goal per line, over one connection
+# Options: --format NAME, --model NAME, --temperature VALUE, --socket PATH
+
+# --- Import required libraries ---
+import json    # json encodes requests and decodes replies
+import os      # os finds the default socket path
+import socket  # socket talks to the daemon
+import sys     # sys reads arguments and stdin
+
+# Same default as main.py
+SOCKET_PATH = os.environ.get(
+    "GOAL_SOCKET", os.path.join(os.environ.get("TMPDIR", "/tmp"), f"goal-planner-{getattr(os, 'getuid', lambda: 0)()}.sock")
+)
+
+USAGE = 'Usage: python goal_client.py "your goal" | - [--format NAME] [--model NAME] [--temperature VALUE] [--socket PATH]'
+
+OPTIONS = {"--format": "output_format", "--model": "model", "--temperature": "temperature", "--socket": "socket"}
+
+
+def parse_args(argv):
+    """Returns (goals, options). Kept to plain string handling so no extra modules load."""
+    goals, options = [], {}
+    args = iter(argv)
+    for arg in args:
+        if arg in OPTIONS:
+            options[OPTIONS[arg]] = next(args, "")
+        elif arg in ("-h", "--help"):
+            print(USAGE)
+            sys.exit(0)
+        else:
+            goals.append(arg)
+    if "temperature" in options:
+        options["temperature"] = float(options["temperature"])
+    return goals, options
+
+
+def main(argv=None):
+    goals, options = parse_args(sys.argv[1:] if argv is None else argv)
+    path = options.pop("socket", SOCKET_PATH)
+    if not goals:
+        sys.exit(USAGE)
+    if goals == ["-"]:
+        goals = (line.strip() for line in sys.stdin if line.strip())
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        sys.exit(f"No goal planner daemon on {path}; start one with: python main.py --serve")
+    replies = client.makefile("r", encoding="utf-8")
+    failed = False
+    with client, replies:
+        for index, goal in enumerate(goals):
+            client.sendall((json.dumps(dict(options, goal=goal)) + "\n").encode("utf-8"))
+            line = replies.readline()
+            if not line:
+                sys.exit("The daemon closed the connection.")
+            reply = json.loads(line)
+            if index:
+                print("\n" + "-" * 40 + "\n")
+            if reply.get("ok"):
+                print(reply["plan"])
+            else:
+                failed = True
+                print(f"Error: {reply.get('error')}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
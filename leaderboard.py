@@ -0,0 +1,113 @@
+# leaderboard.py
+# --------------
+# Reads and writes the model benchmark leaderboard produced by benchmark_models.py.
+# app.py uses it to order the model picker (best models first) and to choose
+# the default model and progressive-mode draft model.
+#
+# The leaderboard is a JSON file (default leaderboard.json, override with the
+# GOAL_LEADERBOARD environment variable). Every save increments its "version";
+# the previous version is kept as leaderboards/leaderboard-v<N>.json so results
+# can be compared across runs.
+# Without a leaderboard the apps keep the built-in order and defaults.
+
+# --- Import required libraries ---
+import json  # json reads and writes the leaderboard file
+import os    # os reads the configuration and builds file paths
+
+# ===================================================
+# CONFIGURATION
+# ===================================================
+LEADERBOARD_PATH = os.environ.get("GOAL_LEADERBOARD", "leaderboard.json")
+
+# Folder (next to the leaderboard file) holding earlier versions
+ARCHIVE_DIR = "leaderboards"
+
+# Bumped when the layout of the file changes; files with another schema are ignored
+SCHEMA_VERSION = 1
+
+
+# ===================================================
+# READING AND WRITING
+# ===================================================
+def load(path=LEADERBOARD_PATH):
+    """The leaderboard as a dict, or None if it is missing, unreadable or of another schema."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            board = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(board, dict) or board.get("schema_version") != SCHEMA_VERSION:
+        return None
+    return board
+
+
+def save(board, path=LEADERBOARD_PATH):
+    """
+    Write a new version of the leaderboard and return its version number.
+    The file being replaced is archived first.
+    """
+    previous = load(path)
+    board["schema_version"] = SCHEMA_VERSION
+    board["version"] = (previous or {}).get("version", 0) + 1
+    if previous is not None:
+        archive = os.path.join(os.path.dirname(path), ARCHIVE_DIR)
+        os.makedirs(archive, exist_ok=True)
+        name = f"{os.path.splitext(os.path.basename(path))[0]}-v{previous['version']}.json"
+        with open(os.path.join(archive, name), "w", encoding="utf-8") as f:
+            json.dump(previous, f, indent=2)
+    # Write to a temporary file and swap it in, so the apps never read half a file
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(board, f, indent=2)
+    os.replace(temporary, path)
+    return board["version"]
+
+
+# ===================================================
+# USING THE RESULTS
+# ===================================================
+def entry_for(model, board):
+    """The leaderboard entry of a model, or None."""
+    for entry in (board or {}).get("models", []):
+        if entry.get("model") == model:
+            return entry
+    return None
+
+
+def order_models(models, board):
+    """
+    Usable benchmarked models in leaderboard order first, then the models that
+    were never benchmarked in their original order, then the models that failed
+    too often in the benchmark ("usable": false).
+    The built-in default (models[0]) stays first if it was never benchmarked.
+    """
+    entries = [entry for entry in (board or {}).get("models", []) if entry.get("model") in models]
+    first = [entry["model"] for entry in entries if entry.get("usable", True)]
+    last = [entry["model"] for entry in entries if not entry.get("usable", True)]
+    if models and entry_for(models[0], board) is None:
+        first.insert(0, models[0])
+    return first + [model for model in models if model not in first and model not in last] + last
+
+
+def default_model(models, board, key="model"):
+    """The leaderboard's recommended model (key "model" or "draft_model") if offered, else the first model."""
+    recommended = (board or {}).get("defaults", {}).get(key)
+    return recommended if recommended in models else models[0]
+
+
+def describe(entry):
+    """One-line summary of a leaderboard entry for the sidebar, e.g. "TTFT 0.4 s · 38 tok/s · 93% format"."""
+    if not entry:
+        return ""
+    parts = []
+    if entry.get("ttft_ms", {}).get("p50") is not None:
+        parts.append(f"TTFT {entry['ttft_ms']['p50'] / 1000:.1f} s")
+    if entry.get("latency_ms", {}).get("p50") is not None:
+        parts.append(f"total {entry['latency_ms']['p50'] / 1000:.1f} s")
+    if entry.get("tokens_per_sec") is not None:
+        parts.append(f"{entry['tokens_per_sec']:.0f} tok/s")
+    if entry.get("format_compliance") is not None:
+        parts.append(f"{entry['format_compliance']:.0%} format")
+    if entry.get("peak_memory_mb") is not None:
+        parts.append(f"{entry['peak_memory_mb']:.0f} MB")
+    return " · ".join(parts)
@@ -0,0 +1,304 @@
+# load_test.py
+# ------------
+# Async load and soak test harness for the goal planner.
+# It drives the real code paths (main.generate_tasks and the streaming
+# backends.stream_completion used by app.py) against the bundled mock server
+# (mock_llm_server.py), so it runs completely offline.
+#
+# Ramp test (increasing concurrency, 10 seconds per level):
+#   python load_test.py --levels 1,4,16,64 --stage-seconds 10
+# Soak test (fixed concurrency for an hour, memory sampled every 30 seconds):
+#   python load_test.py --soak 3600 --concurrency 16 --sample-interval 30
+# Use --url to test against an already running server instead of starting one.
+
+# --- Import required libraries ---
+import argparse   # argparse reads the test settings from the command line
+import asyncio    # asyncio runs many simulated users concurrently
+import gc         # gc settles memory before it is measured
+import json       # json writes the results file
+import math       # math rounds percentile ranks
+import os         # os points the apps at the mock server
+import socket     # socket waits until the mock server accepts connections
+import subprocess # subprocess starts the mock server in its own process
+import sys        # sys finds the running Python interpreter
+import time       # time measures latency and test duration
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Goals sent during the test (cycled in order)
+LOAD_GOALS = [
+    "Start a small online business selling handmade jewelry",
+    "Run a marathon in under 4 hours",
+    "Learn to play the piano",
+    "Write and publish a book",
+    "Build a mobile app for tracking expenses",
+]
+
+# Output formats sent during the test (cycled in order)
+LOAD_FORMATS = ["Standard", "Bullet List", "Numbered List"]
+
+
+# ===================================================
+# MEASUREMENT HELPERS
+# ===================================================
+def rss_mb():
+    """Current resident memory of this process in MB (Linux), or peak RSS elsewhere."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list (None when empty)."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def slope_per_hour(samples):
+    """Least-squares slope of (seconds, MB) samples, in MB per hour."""
+    if len(samples) < 2:
+        return 0.0
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_m = sum(m for _, m in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if not var:
+        return 0.0
+    cov = sum((t - mean_t) * (m - mean_m) for t, m in samples)
+    return cov / var * 3600
+
+
+# ===================================================
+# MOCK SERVER MANAGEMENT
+# ===================================================
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(args):
+    """Start mock_llm_server.py in a separate process and wait until it accepts connections."""
+    port = free_port()
+    command = [
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_llm_server.py"),
+        "--port", str(port),
+        "--latency", str(args.mock_latency),
+        "--token-rate", str(args.mock_token_rate),
+        "--tokens", str(args.mock_tokens),
+        "--error-rate", str(args.mock_error_rate),
+        "--rate-limit-rate", str(args.mock_rate_limit_rate),
+        "--max-concurrency", str(args.mock_max_concurrency),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Mock server did not start within 10 seconds")
+
+
+def point_apps_at(url):
+    """Send both OpenAI and Ollama traffic to the server at url. Must run before importing the apps."""
+    os.environ["OPENAI_BASE_URL"] = url.rstrip("/") + "/v1"
+    os.environ["OLLAMA_HOST"] = url.rstrip("/")
+    os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+    # Measure the backend path, not cache hits
+    os.environ.setdefault("GOAL_CACHE", "0")
+    # Keep test traffic out of the request log (set GOAL_LOG=1 to include its cost)
+    os.environ.setdefault("GOAL_LOG", "0")
+
+
+# ===================================================
+# TARGETS (THE REAL CODE PATHS)
+# ===================================================
+def make_target(name, model):
+    """
+    Returns an async function (goal, output_format) -> time to first token or None.
+    The apps are imported here, after the environment points at the test server.
+    """
+    import backends
+    if name == "main":
+        import main
+
+        async def run_main(goal, output_format):
+            await main.generate_tasks(goal, output_format, 0.7, model)
+            return None
+        return run_main
+
+    def stream(goal, output_format):
+        started = time.perf_counter()
+        first = None
+        messages = backends.build_messages(goal, output_format)
+        for _ in backends.stream_completion(model, messages, 0.7, 300):
+            if first is None:
+                first = time.perf_counter() - started
+        return first
+
+    async def run_stream(goal, output_format):
+        return await asyncio.to_thread(stream, goal, output_format)
+    return run_stream
+
+
+# ===================================================
+# LOAD GENERATION
+# ===================================================
+async def run_stage(target, concurrency, seconds, sample_interval=None):
+    """
+    Run `concurrency` simulated users back to back for `seconds`.
+    Returns a dict of throughput, latency percentiles, errors and memory.
+    """
+    gc.collect()
+    rss_start = rss_mb()
+    latencies, ttfts, errors = [], [], Counter()
+    memory_samples = [(0.0, rss_start)]
+    started = time.monotonic()
+    end = started + seconds
+    counter = iter(range(10 ** 12))
+
+    async def user():
+        while time.monotonic() < end:
+            n = next(counter)
+            goal = LOAD_GOALS[n % len(LOAD_GOALS)]
+            output_format = LOAD_FORMATS[n % len(LOAD_FORMATS)]
+            t0 = time.perf_counter()
+            try:
+                ttft = await target(goal, output_format)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+            if ttft is not None:
+                ttfts.append(ttft)
+
+    async def sampler():
+        while time.monotonic() < end:
+            await asyncio.sleep(sample_interval)
+            memory_samples.append((time.monotonic() - started, rss_mb()))
+
+    tasks = [asyncio.create_task(user()) for _ in range(concurrency)]
+    if sample_interval:
+        tasks.append(asyncio.create_task(sampler()))
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+    gc.collect()
+    rss_end = rss_mb()
+    memory_samples.append((elapsed, rss_end))
+
+    latencies.sort()
+    ttfts.sort()
+    total = len(latencies) + sum(errors.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": total,
+        "ok": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "errors": dict(errors),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "ttft_p50": percentile(ttfts, 50),
+        "ttft_p95": percentile(ttfts, 95),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_end, 1),
+        "rss_growth_mb": round(rss_end - rss_start, 1),
+        "rss_slope_mb_per_hour": round(slope_per_hour(memory_samples), 2),
+    }
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value * 1000:.0f}ms"
+
+
+def print_report(results):
+    print(f"\n{'conc':>5} {'reqs':>6} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'ttft50':>8} {'rss MB':>8} {'growth':>7}")
+    for r in results:
+        print(
+            f"{r['concurrency']:>5} {r['requests']:>6} {r['throughput_rps']:>8.2f} {r['error_rate'] * 100:>5.1f}% "
+            f"{format_seconds(r['latency_p50']):>8} {format_seconds(r['latency_p95']):>8} {format_seconds(r['latency_p99']):>8} "
+            f"{format_seconds(r['ttft_p50']):>8} {r['rss_end_mb']:>8.1f} {r['rss_growth_mb']:>+7.1f}"
+        )
+        if r["errors"]:
+            print(f"      errors: {r['errors']}")
+
+
+async def run(args):
+    levels = [args.concurrency] if args.soak else [int(level) for level in args.levels.split(",")]
+    # asyncio.to_thread uses the default executor; size it so threads never cap concurrency
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max(levels) + 4))
+    import openai
+    openai.max_retries = args.max_retries
+    target = make_target(args.target, args.model)
+    # One warm-up request so client creation and imports are not counted as growth
+    await target(LOAD_GOALS[0], LOAD_FORMATS[0])
+    results = []
+    if args.soak:
+        print(f"Soak test: {args.concurrency} users for {args.soak}s against {args.model} ({args.target})")
+        results.append(await run_stage(target, args.concurrency, args.soak, args.sample_interval))
+    else:
+        for level in levels:
+            print(f"Running {level} concurrent users for {args.stage_seconds}s against {args.model} ({args.target})...")
+            results.append(await run_stage(target, level, args.stage_seconds))
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load and soak test the goal planner against a mock LLM server.")
+    parser.add_argument("--target", choices=["main", "stream"], default="main",
+                        help="main = main.generate_tasks (async CLI path), stream = backends.stream_completion (app.py path)")
+    parser.add_argument("--model", default="OpenAI API", help="'OpenAI API' or an Ollama model name")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma separated concurrency levels for the ramp")
+    parser.add_argument("--stage-seconds", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--soak", type=float, default=0, help="run a soak test for this many seconds instead of a ramp")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent users during a soak test")
+    parser.add_argument("--sample-interval", type=float, default=10.0, help="seconds between memory samples during a soak test")
+    parser.add_argument("--max-retries", type=int, default=2, help="OpenAI client retries (429s are retried)")
+    parser.add_argument("--url", default=None, help="use an already running server instead of starting the mock")
+    parser.add_argument("--json", default=None, help="also write the results to this JSON file")
+    mock = parser.add_argument_group("mock server behavior")
+    mock.add_argument("--mock-latency", type=float, default=0.2)
+    mock.add_argument("--mock-token-rate", type=float, default=200.0)
+    mock.add_argument("--mock-tokens", type=int, default=60)
+    mock.add_argument("--mock-error-rate", type=float, default=0.0)
+    mock.add_argument("--mock-rate-limit-rate", type=float, default=0.0)
+    mock.add_argument("--mock-max-concurrency", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_mock_server(args)
+    point_apps_at(url)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    print_report(results)
+    if args.soak:
+        print(f"\nMemory slope: {results[0]['rss_slope_mb_per_hour']:+.2f} MB/hour")
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump({"target": args.target, "model": args.model, "results": results}, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
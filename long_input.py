@@ -0,0 +1,203 @@
+# long_input.py
+# -------------
+# Condenses very long goal descriptions (e.g. a pasted project brief) before
+# they are turned into a plan.
+# Sending such text verbatim makes the prompt large and slow, and very long
+# inputs are rejected by the API. Instead the text is split into chunks, all
+# chunks are summarized at the same time by a cheap model ("map"), and the
+# summaries are merged into one short goal statement ("reduce").
+# The number of chunks is capped, so the delay is about two short model calls
+# whatever the size of the input.
+
+# --- Import required libraries ---
+import math   # math sizes the chunks
+import os     # os reads the configuration
+import re     # re splits text into paragraphs and sentences
+from concurrent.futures import ThreadPoolExecutor  # summarizes the chunks concurrently
+
+import backends
+import generations
+import profiling
+from conversation import estimate_tokens, truncate_to_tokens
+
+# ===================================================
+# CONFIGURATION
+# ===================================================
+# Goals longer than this (estimated tokens) are condensed; shorter ones are sent as they are
+LONG_INPUT_TOKENS = int(os.environ.get("GOAL_LONG_INPUT_TOKENS", "400"))
+
+# Preferred chunk size, and the largest chunk one summary call may receive
+CHUNK_TOKENS = 1500
+MAX_CHUNK_TOKENS = 6000
+# Local models run with Ollama's default context window (2048 tokens on older
+# versions), which must hold the chunk, the instructions and the summary;
+# larger chunks would be cut off silently by Ollama
+LOCAL_MAX_CHUNK_TOKENS = 1500
+
+# At most this many chunks are summarized (all at once); beyond
+# MAX_CHUNKS x the largest chunk size the end of the text is cut off
+MAX_CHUNKS = 8
+
+# Length of each chunk summary and of the final goal statement (tokens)
+CHUNK_SUMMARY_TOKENS = 150
+GOAL_SUMMARY_TOKENS = 250
+
+# Model used for summaries; by default a cheap model of the selected model's backend:
+# gpt-3.5-turbo for OpenAI, the first draft model (backends.DRAFT_MODEL_OPTIONS) for Ollama.
+# If it fails (e.g. the draft model is not pulled), the selected model is used instead
+SUMMARY_MODEL = os.environ.get("GOAL_SUMMARY_MODEL", "")
+
+CHUNK_INSTRUCTIONS = (
+    "You condense one part of a user's description of their goal or project. "
+    "Summarize it in at most 80 words, keeping the goal, deliverables, deadlines, budgets and constraints. "
+    "Output only the summary."
+)
+
+REDUCE_INSTRUCTIONS = (
+    "The user's text is a set of summaries of consecutive parts of one description of their goal. "
+    "Combine them into a single goal statement of at most 120 words. Start with the goal itself, "
+    "phrased as something to achieve, then list the key deliverables, deadlines and constraints. "
+    "Output only the goal statement."
+)
+
+
+# ===================================================
+# MEASURING AND SPLITTING
+# ===================================================
+def needs_condensing(text, threshold=LONG_INPUT_TOKENS):
+    """True if the text is too long to send as a goal verbatim."""
+    return estimate_tokens(text) > threshold
+
+
+def _pieces(text, piece_chars):
+    """Paragraphs, split further into sentences (and hard cuts) when longer than piece_chars."""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= piece_chars:
+            yield paragraph
+            continue
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            while len(sentence) > piece_chars:
+                yield sentence[:piece_chars]
+                sentence = sentence[piece_chars:]
+            if sentence:
+                yield sentence
+
+
+def _pack(text, chunk_tokens):
+    """Greedily pack paragraphs/sentences into chunks of about chunk_tokens."""
+    chunk_chars = chunk_tokens * 4
+    chunks, current = [], ""
+    for piece in _pieces(text, chunk_chars):
+        if current and len(current) + len(piece) + 2 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_chunks(text, chunk_tokens=CHUNK_TOKENS, max_chunks=MAX_CHUNKS, max_chunk_tokens=MAX_CHUNK_TOKENS):
+    """
+    Split text into at most `max_chunks` chunks on paragraph and sentence boundaries.
+    Chunks grow beyond chunk_tokens (up to max_chunk_tokens) instead of adding more
+    chunks; text beyond max_chunks x max_chunk_tokens is dropped.
+    """
+    text = truncate_to_tokens(text, max_chunks * max_chunk_tokens)
+    size = max(chunk_tokens, math.ceil(estimate_tokens(text) / max_chunks))
+    chunks = _pack(text, size)
+    # Packing on boundaries wastes a little room; grow the chunks until the cap holds
+    while len(chunks) > max_chunks and size < max_chunk_tokens:
+        size = min(max_chunk_tokens, math.ceil(size * 1.15))
+        chunks = _pack(text, size)
+    # Any overflow left at the largest chunk size is the end of the text, which is dropped
+    return chunks[:max_chunks]
+
+
+# ===================================================
+# MAP-REDUCE CONDENSING
+# ===================================================
+def summary_model(model):
+    """The cheap model used to condense goals for the selected model."""
+    if SUMMARY_MODEL:
+        return SUMMARY_MODEL
+    if backends.is_openai_model(model):
+        return backends.OPENAI_MODEL
+    # A tiny local model answers all chunks quickly; a large selected model
+    # would make the concurrent summaries queue up in Ollama
+    return model if model in backends.DRAFT_MODEL_OPTIONS else backends.DRAFT_MODEL_OPTIONS[0]
+
+
+def max_chunk_tokens(model):
+    """The largest chunk the summary model can take in one call."""
+    return MAX_CHUNK_TOKENS if backends.is_openai_model(model) else LOCAL_MAX_CHUNK_TOKENS
+
+
+class CondenseError(Exception):
+    """Raised when no summary could be produced with any summary model."""
+
+
+def summary_models(model):
+    """Models to try for summaries: the cheap model, then the selected model if it differs."""
+    cheap = summary_model(model)
+    return [cheap] if cheap == model else [cheap, model]
+
+
+def _summarize(models, text, instructions, max_tokens, generation):
+    """Summarize with the first model that answers; raises the last model's error if none does."""
+    for i, model in enumerate(models):
+        try:
+            return backends.summarize(model, text, instructions, max_tokens, generation)
+        except generations.GenerationCancelled:
+            raise
+        except Exception:
+            # e.g. the draft model was never pulled; try the selected model next
+            if i == len(models) - 1:
+                raise
+
+
+def condense(text, model, generation=None):
+    """
+    Return a short goal statement for a long goal description.
+    Chunks are summarized concurrently with the cheap summary model, or the
+    selected model if that fails. A chunk neither can summarize is replaced by
+    its start; if no chunk could be summarized, CondenseError is raised.
+    Short text is returned unchanged. If the request's generation is cancelled,
+    GenerationCancelled is raised instead.
+    """
+    if not needs_condensing(text):
+        return text
+    models = summary_models(model)
+    errors = []
+
+    def summarize_chunk(chunk):
+        try:
+            return _summarize(models, chunk, CHUNK_INSTRUCTIONS, CHUNK_SUMMARY_TOKENS, generation)
+        except generations.GenerationCancelled:
+            raise
+        except Exception as e:
+            errors.append(e)
+            return truncate_to_tokens(chunk, CHUNK_SUMMARY_TOKENS)
+
+    # Chunks must fit the smallest context of the models that may summarize them
+    largest = min(max_chunk_tokens(m) for m in models)
+    chunks = split_chunks(text, min(CHUNK_TOKENS, largest), MAX_CHUNKS, largest)
+    with ThreadPoolExecutor(max_workers=max(1, len(chunks))) as pool:
+        summaries = [s for s in pool.map(profiling.bind(summarize_chunk), chunks) if s.strip()]
+
+    if len(errors) == len(chunks):
+        raise CondenseError(f"no summary model answered ({', '.join(models)}): {errors[-1]}")
+    # One chunk's summary is already the condensed goal
+    combined = "\n\n".join(summaries)
+    if len(summaries) == 1 and not needs_condensing(combined):
+        return combined
+    try:
+        return _summarize(models, combined, REDUCE_INSTRUCTIONS, GOAL_SUMMARY_TOKENS, generation)
+    except generations.GenerationCancelled:
+        raise
+    except Exception:
+        # The chunk summaries are still a summary, just a longer one
+        return truncate_to_tokens(combined, LONG_INPUT_TOKENS)
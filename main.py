@@ -1,12 +1,23 @@
 import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
 import openai
 import asyncio
-from guardrails import is_goal_related, not_a_goal_message
+import backends
+import formatting
+import generations
+import long_input
+import profiling
+import request_log
+import response_cache
 
 # If running outside Colab, set your OpenAI API key here or via environment variables
+# The key is checked when the CLI starts, so tools can import this module without one
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
-if not OPENAI_API_KEY:
-    raise ValueError("Please set the OPENAI_API_KEY environment variable.")
 
 # --- Agent and Runner Implementation Placeholder ---
 # The original notebook imports Agent and Runner from 'agents'.
@@ -20,29 +31,61 @@ class Agent:
 
 class Runner:
     @staticmethod
-    async def run(agent, goal, output_format="Standard"):
-        import openai
-        openai.api_key = os.environ.get("OPENAI_API_KEY", "")
+    def build_messages(agent, goal, output_format="Standard"):
         # Adjust user prompt based on format
-        if output_format == "Numbered":
+        if output_format in ("Numbered", "Numbered List"):
             user_prompt = f"My goal: {goal}\n\nOutput ONLY a markdown numbered list of actionable steps (1., 2., 3., etc.). Do NOT use bullet points, paragraphs, headings, or summaries—just the numbered steps."
         elif output_format == "Bullet List":
             user_prompt = f"My goal: {goal}\n\nOutput ONLY a markdown bullet list of actionable steps (using '-', '*', or '+'). Do NOT use numbered lists, paragraphs, headings, or summaries—just bullet points."
         else:
             user_prompt = f"My goal: {goal}\n\nProvide a visually appealing, well-organized plan to achieve this goal. Use a mix of short paragraphs, bullet points, and numbered lists as appropriate to make the plan clear, actionable, and easy to follow. Make it look good and professional."
+        return [
+            {"role": "system", "content": agent.instructions},
+            {"role": "user", "content": user_prompt},
+        ]
 
-        response = await asyncio.to_thread(
-            openai.chat.completions.create,
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": agent.instructions},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=500,
-            temperature=0.7,
-        )
+    @staticmethod
+    async def run(agent, goal, output_format="Standard", temperature=0.7, model="OpenAI API", generation=None):
+        openai.api_key = os.environ.get("OPENAI_API_KEY", "")
+        # Backend calls run in worker threads; the generation lets us stop them
+        # when this coroutine is cancelled (see generations.py), and
+        # profiling.bind() keeps them in this request's profile
+        owned = generation is None
+        if owned:
+            generation = generations.tracker.start()
+        try:
+            with profiling.stage("build_prompt"):
+                messages = Runner.build_messages(agent, goal, output_format)
+            # Answer repeated goals from the shared response cache
+            cache = response_cache.default_cache()
+            with profiling.stage("cache_lookup"):
+                output = await asyncio.to_thread(profiling.bind(cache.get), model, messages, temperature)
+            cache_hit = output is not None
+            if not cache_hit:
+                with profiling.stage("backend_call"):
+                    output = await asyncio.to_thread(profiling.bind(backends.complete), model, messages, temperature, 500, generation)
+                # Fix the format locally if the model ignored the instructions
+                with profiling.stage("format_repair"):
+                    output = await asyncio.to_thread(
+                        profiling.bind(formatting.ensure_format),
+                        output,
+                        output_format,
+                        lambda text: backends.reformat(model, text, output_format, generation=generation),
+                    )
+                with profiling.stage("cache_store"):
+                    await asyncio.to_thread(profiling.bind(cache.put), model, messages, temperature, output)
+        except asyncio.CancelledError:
+            # Close the backend stream so the worker thread stops now
+            # instead of generating a plan nobody will read
+            generation.cancel("cancelled")
+            raise
+        finally:
+            if owned:
+                generations.tracker.finish(generation)
         class Result:
-            final_output = response.choices[0].message.content.strip()
+            final_output = output
+        Result.messages = messages
+        Result.cache_hit = cache_hit
         return Result()
 
 # Define the Task Generator agent
@@ -52,14 +95,57 @@ task_generator = Agent(
     instructions="""You help users break down their specific LLM powered AI Agent goal into small, achievable tasks.\nFor any goal, analyze it and create a structured plan with specific actionable steps.\nEach task should be concrete, time-bound when possible, and manageable.\nOrganize tasks in a logical sequence with dependencies clearly marked.\nNever answer anything unrelated to AI Agents.""",
 )
 
+# Record every request in the request log (written in the background, see request_log.py)
+def log_request(goal, output_format, temperature, model, started, **fields):
+    request_log.default_log().log(
+        source="main", goal=goal, output_format=output_format, model=model, temperature=temperature,
+        latency_ms=round((time.monotonic() - started) * 1000, 1), **fields
+    )
+
 # Define a function to run the agent
-async def generate_tasks(goal, output_format="Standard", temperature=0.7):
+# The request is aborted after `deadline` seconds (GOAL_REQUEST_DEADLINE, 0 = none)
+async def generate_tasks(goal, output_format="Standard", temperature=0.7, model="OpenAI API",
+                         deadline=generations.REQUEST_DEADLINE):
+    started = time.monotonic()
     # Guardrail: check if input is a goal
-    if not is_goal_related(goal):
-        class Result:
-            final_output = not_a_goal_message()
-        return Result()
-    result = await Runner.run(task_generator, goal, output_format, temperature)
+    with profiling.stage("is_goal"):
+        valid_goal = is_goal(goal)
+    if not valid_goal:
+        log_request(goal, output_format, temperature, model, started, valid_goal=False)
+        return not_a_goal_message()
+    condensed = None
+    generation = generations.tracker.start(deadline=deadline)
+
+    async def plan():
+        nonlocal condensed
+        # Long descriptions (e.g. a pasted project brief) are condensed into a short goal first
+        if long_input.needs_condensing(goal):
+            try:
+                with profiling.stage("condense_input"):
+                    condensed = await asyncio.to_thread(profiling.bind(long_input.condense), goal, model, generation)
+            except long_input.CondenseError as e:
+                print(f"Could not condense the goal description, sending it as is: {e}", file=sys.stderr)
+        return await Runner.run(task_generator, condensed or goal, output_format, temperature, model, generation)
+
+    try:
+        result = await asyncio.wait_for(plan(), deadline or None)
+    except (Exception, asyncio.CancelledError) as e:
+        if isinstance(e, asyncio.TimeoutError):
+            error = "deadline exceeded"
+        elif isinstance(e, asyncio.CancelledError):
+            error = "cancelled"
+        else:
+            error = str(e) or type(e).__name__
+        log_request(goal, output_format, temperature, model, started, valid_goal=True,
+                    condensed_goal=condensed, error=error)
+        raise
+    finally:
+        # Stops anything still running for this request
+        generations.tracker.finish(generation)
+    log_request(
+        goal, output_format, temperature, model, started, valid_goal=True, condensed_goal=condensed,
+        messages=result.messages, response=result.final_output, cache_hit=result.cache_hit,
+    )
     return result.final_output
 
 # Example usage
@@ -88,22 +174,276 @@ def is_goal(text):
         return False
     return True
 
-async def main():
-    user_goal = input("Enter your goal: ")
+def not_a_goal_message():
+    lines = ["Not a goal.", f"A goal is: {definition}", "Examples of goals:"]
+    lines += [f"- {eg}" for eg in goal_examples]
+    lines.append("Please submit a valid goal.")
+    return "\n".join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Break a goal down into an actionable task plan.")
+    parser.add_argument(
+        "--profile", nargs="?", const="sample", choices=["sample", "cprofile"],
+        help="profile each request (also in --repl/--serve) and write it to the profiles/ folder (default: sample)",
+    )
+    parser.add_argument(
+        "--file", metavar="PATH",
+        help="read a long goal description (e.g. a project brief) from a file, or '-' for stdin",
+    )
+    parser.add_argument("--model", default="OpenAI API", help='"OpenAI API" or a local Ollama model')
+    parser.add_argument("--format", default="Standard", help="Standard, Bullet List or Numbered List")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--repl", action="store_true", help="plan many goals interactively in one process")
+    mode.add_argument("--serve", action="store_true", help="run as a daemon on a Unix socket (see goal_client.py)")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path for --serve")
+    return parser.parse_args(argv)
+
+def check_api_key(model):
+    if not OPENAI_API_KEY and backends.is_openai_model(model):
+        raise ValueError("Please set the OPENAI_API_KEY environment variable.")
+
+def read_goal(path=None):
+    """The goal typed at the prompt, or the whole contents of a file (or stdin for '-')."""
+    if path is None:
+        return input("Enter your goal: ")
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def finish_profile(profile, **metadata):
+    """Write the profile, if one was recorded, and say where it went."""
+    path = profile.finish(**metadata)
+    if path:
+        print(f"\nProfile written to {path}", file=sys.stderr)
+
+async def main(profile_mode=None, goal_file=None, output_format="Standard", temperature=0.7, model="OpenAI API"):
+    check_api_key(model)
+    user_goal = read_goal(goal_file)
     if user_goal.strip() == "":
         print("Please enter a goal.")
         return
-    if not is_goal(user_goal):
-        print("\nNot a goal.")
-        print(f"A goal is: {definition}")
-        print("Examples of goals:")
-        for eg in goal_examples:
-            print(f"- {eg}")
-        print("Please submit a valid goal.")
-        return
-    tasks = await generate_tasks(user_goal)
-    print("\nDetailed Task Plan:\n")
-    print(tasks)
+    # Profiling is off unless requested with --profile or GOAL_PROFILE
+    profile = profiling.start_request(profile_mode, entrypoint="main", model=model, output_format=output_format, goal_chars=len(user_goal))
+    valid_goal = None
+    try:
+        valid_goal = is_goal(user_goal)
+        if not valid_goal:
+            print("\n" + not_a_goal_message())
+            return
+        tasks = await generate_tasks(user_goal, output_format, temperature, model)
+        with profiling.stage("render"):
+            print("\nDetailed Task Plan:\n")
+            print(tasks)
+    finally:
+        finish_profile(profile, valid_goal=valid_goal)
+
+# ===================================================
+# LONG-LIVED MODES: REPL AND DAEMON
+# ===================================================
+# Starting Python, importing openai and opening a new TLS connection cost far
+# more than planning one goal from a warm process. --repl and --serve keep one
+# process, with its connection pools, response cache and request log, alive
+# across many goals. goal_client.py is a thin client for the daemon.
+# --profile and GOAL_PROFILE work here too: each goal gets its own profile.
+
+# Default socket of the daemon (goal_client.py computes the same path)
+SOCKET_PATH = os.environ.get(
+    "GOAL_SOCKET", os.path.join(os.environ.get("TMPDIR", "/tmp"), f"goal-planner-{getattr(os, 'getuid', lambda: 0)()}.sock")
+)
+
+# Canonical names of the output formats, by formatting.normalize_format kind
+FORMAT_NAMES = {"standard": "Standard", "bullet": "Bullet List", "numbered": "Numbered List"}
+
+REPL_HELP = """Type a goal to get a plan (Ctrl-C cancels a plan that is being generated).
+Commands:
+  :format standard|bullet|numbered
+  :model NAME            e.g. :model llama3.2:3b or :model OpenAI API
+  :temperature VALUE
+  :quit"""
+
+def apply_repl_command(settings, line):
+    """Change a REPL setting; returns False when the REPL should exit."""
+    command, _, value = line[1:].partition(" ")
+    value = value.strip()
+    if command in ("quit", "q", "exit"):
+        return False
+    if command == "format" and value:
+        settings["output_format"] = FORMAT_NAMES[formatting.normalize_format(value)]
+    elif command == "model" and value:
+        settings["model"] = value
+    elif command == "temperature" and value:
+        try:
+            settings["temperature"] = float(value)
+        except ValueError:
+            print("Temperature must be a number.")
+    else:
+        print(REPL_HELP)
+    print(f"[{settings['model']} | {settings['output_format']} | temperature {settings['temperature']}]")
+    return True
+
+async def repl(settings):
+    print(REPL_HELP)
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            line = input("\ngoal> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        if not line:
+            continue
+        if line.startswith(":"):
+            if not apply_repl_command(settings, line):
+                return
+            continue
+        try:
+            check_api_key(settings["model"])
+        except ValueError as e:
+            print(e)
+            continue
+        # Started before the task, which runs in a copy of this context
+        profile = profiling.start_request(
+            settings.get("profile_mode"), entrypoint="repl", model=settings["model"],
+            output_format=settings["output_format"], goal_chars=len(line),
+        )
+        task = asyncio.ensure_future(
+            generate_tasks(line, settings["output_format"], settings["temperature"], settings["model"])
+        )
+        # Ctrl-C cancels this plan (and its backend stream), not the REPL
+        loop.add_signal_handler(signal.SIGINT, task.cancel)
+        try:
+            print("\n" + await task)
+        except asyncio.CancelledError:
+            print("(cancelled)")
+        except Exception as e:
+            print(f"Error: {e}")
+        finally:
+            loop.remove_signal_handler(signal.SIGINT)
+            finish_profile(profile)
+
+# Fields a daemon request may set, with the types they must have
+REQUEST_FIELDS = {"cmd": str, "goal": str, "model": str, "output_format": str, "temperature": (int, float)}
+
+def read_request(line, settings):
+    """
+    Decode and check one daemon request. Missing or null fields take the daemon's
+    settings. Returns (request dict, None) or (None, error message).
+    """
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return None, "request must be one line of JSON"
+    if not isinstance(request, dict):
+        return None, "request must be a JSON object"
+    request = {name: value for name, value in request.items() if value is not None}
+    for name, types in REQUEST_FIELDS.items():
+        # bool is an int in Python, but never a valid temperature
+        if name in request and (not isinstance(request[name], types) or isinstance(request[name], bool)):
+            expected = "a number" if name == "temperature" else "a string"
+            return None, f"{name} must be {expected}"
+    return {**settings, "goal": "", **request}, None
+
+async def answer_request(line, settings):
+    """Handle one daemon request (a JSON line) and return the reply as a dict."""
+    request, error = read_request(line, settings)
+    if error:
+        return {"ok": False, "error": error}
+    if request.get("cmd") == "ping":
+        return {"ok": True, "pid": os.getpid()}
+    goal = request["goal"]
+    model = request["model"]
+    output_format = FORMAT_NAMES[formatting.normalize_format(request["output_format"])]
+    if not goal.strip():
+        return {"ok": False, "error": "Please enter a goal."}
+    # This runs in its own task, so every request gets its own profile (concurrent
+    # requests share the event loop thread, so its samples may include the others)
+    profile = profiling.start_request(
+        settings.get("profile_mode"), entrypoint="daemon", model=model,
+        output_format=output_format, goal_chars=len(goal),
+    )
+    valid_goal = None
+    try:
+        valid_goal = is_goal(goal)
+        if not valid_goal:
+            return {"ok": True, "valid_goal": False, "plan": not_a_goal_message()}
+        try:
+            check_api_key(model)
+            plan = await generate_tasks(goal, output_format, float(request["temperature"]), model)
+        except Exception as e:
+            return {"ok": False, "error": str(e) or type(e).__name__}
+        return {"ok": True, "valid_goal": True, "plan": plan}
+    finally:
+        finish_profile(profile, valid_goal=valid_goal)
+
+async def serve_client(reader, writer, settings):
+    """Answer the JSON-line requests of one connection, in order."""
+    next_line = asyncio.ensure_future(reader.readline())
+    try:
+        while True:
+            line = await next_line
+            if not line:
+                return
+            # Keep reading while the plan is generated, to notice a client that hangs up
+            next_line = asyncio.ensure_future(reader.readline())
+            task = asyncio.ensure_future(answer_request(line, settings))
+            await asyncio.wait({task, next_line}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done() and next_line.done() and (next_line.exception() or not next_line.result()):
+                # Nobody is waiting for this plan any more: stop generating it
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return
+            try:
+                reply = await task
+            except Exception as e:
+                # A bad request must not end the connection without a reply
+                reply = {"ok": False, "error": str(e) or type(e).__name__}
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+    except (ConnectionError, ValueError):
+        pass
+    finally:
+        next_line.cancel()
+        writer.close()
+
+async def serve(path, settings):
+    # Remove a socket left behind by a daemon that is no longer running
+    if os.path.exists(path):
+        try:
+            probe = socket.socket(socket.AF_UNIX)
+            probe.connect(path)
+            probe.close()
+            raise SystemExit(f"A daemon is already listening on {path}")
+        except ConnectionRefusedError:
+            os.unlink(path)
+    server = await asyncio.start_unix_server(
+        lambda reader, writer: serve_client(reader, writer, settings),
+        path=path,
+        limit=16 * 1024 * 1024,  # long goal descriptions arrive as a single line
+    )
+    os.chmod(path, 0o600)  # only this user can send goals
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    print(f"Goal planner daemon listening on {path}", file=sys.stderr)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    settings = {
+        "model": args.model,
+        "output_format": FORMAT_NAMES[formatting.normalize_format(args.format)],
+        "temperature": args.temperature,
+        "profile_mode": args.profile,
+    }
+    if args.serve:
+        asyncio.run(serve(args.socket, settings))
+    elif args.repl:
+        asyncio.run(repl(settings))
+    else:
+        asyncio.run(main(args.profile, args.file, settings["output_format"], args.temperature, args.model))
@@ -0,0 +1,317 @@
+# mock_llm_server.py
+# ------------------
+# A local mock language model server for offline load and soak testing.
+# It speaks just enough of two APIs for the apps to talk to it unchanged:
+#   - OpenAI:  POST /v1/chat/completions (streaming and non-streaming), GET /v1/models
+#   - Ollama:  POST /api/generate, POST /api/chat, GET /api/tags
+# Latency, token rate, response length, error injection and 429 (rate limit)
+# behavior are all configurable from the command line.
+#
+# Usage:
+#   python mock_llm_server.py --port 8799 --latency 0.3 --token-rate 80 --error-rate 0.01
+# Then point the apps at it:
+#   OPENAI_BASE_URL=http://127.0.0.1:8799/v1 OLLAMA_HOST=http://127.0.0.1:8799 streamlit run app.py
+
+# --- Import required libraries ---
+import argparse   # argparse reads the server settings from the command line
+import json       # json encodes and decodes the API payloads
+import random     # random drives error and rate-limit injection
+import re         # re detects the output format requested in the prompt
+import sys        # sys inspects errors raised while handling a request
+import threading  # threading tracks how many requests are in flight
+import time       # time simulates latency and token rate
+import uuid       # uuid creates response ids
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ===================================================
+# SERVER CONFIGURATION
+# ===================================================
+@dataclass
+class MockConfig:
+    """Behavior of the mock server. Every field can be set from the command line."""
+    latency: float = 0.2           # Seconds before the first token is sent
+    token_rate: float = 50.0       # Tokens per second once generation starts (0 = instant)
+    tokens: int = 60               # Approximate number of tokens per response
+    error_rate: float = 0.0        # Fraction of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0   # Fraction of requests answered with HTTP 429
+    max_concurrency: int = 0       # Requests above this many in flight get HTTP 429 (0 = unlimited)
+    retry_after: float = 1.0       # Value of the Retry-After header on 429 responses
+    seed: int = None               # Seed for repeatable error injection
+
+
+# Words used to build the canned plan text
+STEP_WORDS = [
+    "Define", "the", "goal", "clearly", "and", "set", "a", "deadline", "for", "each",
+    "milestone", "then", "gather", "resources", "track", "progress", "weekly", "review",
+]
+
+
+def make_steps(prompt, tokens):
+    """
+    Build a canned plan that follows the format asked for in the prompt,
+    so format checks behave like they would against a well-behaved model.
+    Returns a list of text pieces, roughly one token each.
+    """
+    prompt = prompt.lower()
+    # Look for the positive instruction ("as a bullet list"), not the
+    # negative one ("do not use bullet points") that other formats include
+    bullets = re.search(r"(as a|markdown) bullet list|in bullet points", prompt) is not None
+    numbered = re.search(r"(as a|markdown) numbered list", prompt) is not None
+    pieces = []
+    # The standard format opens with a short overview paragraph
+    if not bullets and not numbered:
+        pieces.append("Here is a plan to reach your goal.\n\n")
+    for i in range(max(1, tokens // 10)):
+        pieces.append("- " if bullets else f"{i + 1}. ")
+        for j in range(9):
+            pieces.append(STEP_WORDS[(i * 9 + j) % len(STEP_WORDS)] + " ")
+        pieces.append("\n")
+    return pieces
+
+
+def last_user_message(messages):
+    """Returns the text of the most recent user message in a chat payload."""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content", ""))
+    return ""
+
+
+# ===================================================
+# REQUEST HANDLER
+# ===================================================
+class MockHandler(BaseHTTPRequestHandler):
+    """Handles one HTTP request using the settings in self.server.config."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+
+    def log_message(self, format, *args):
+        # Keep the console quiet; access logs would swamp a load test
+        pass
+
+    # -----------------------------------------------
+    # HELPERS
+    # -----------------------------------------------
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body or b"{}")
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type):
+        # Chunked transfer encoding lets us send tokens as they are "generated"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _injected_failure(self):
+        """
+        Decide whether this request fails on purpose.
+        Returns True after sending the error response, False otherwise.
+        """
+        config = self.server.config
+        server = self.server
+        if config.max_concurrency and server.in_flight > config.max_concurrency:
+            self._rate_limited()
+            return True
+        roll = server.random.random()
+        if roll < config.rate_limit_rate:
+            self._rate_limited()
+            return True
+        if roll < config.rate_limit_rate + config.error_rate:
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return True
+        return False
+
+    def _rate_limited(self):
+        self._send_json(
+            429,
+            {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+            {"Retry-After": str(self.server.config.retry_after)},
+        )
+
+    def _generate(self, prompt):
+        """Yield text pieces with the configured latency and token rate."""
+        config = self.server.config
+        time.sleep(config.latency)
+        delay = 1.0 / config.token_rate if config.token_rate > 0 else 0.0
+        for piece in make_steps(prompt, config.tokens):
+            if delay:
+                time.sleep(delay)
+            yield piece
+
+    # -----------------------------------------------
+    # ROUTES
+    # -----------------------------------------------
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model", "owned_by": "mock"}]})
+        elif self.path.rstrip("/") == "/api/tags":
+            self._send_json(200, {"models": [{"name": "mock:latest", "model": "mock:latest"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.in_flight += 1
+        try:
+            path = self.path.rstrip("/")
+            payload = self._read_json()
+            if self._injected_failure():
+                return
+            if path == "/v1/chat/completions":
+                self._openai_chat(payload)
+            elif path in ("/api/generate", "/api/chat"):
+                self._ollama(payload, chat=path == "/api/chat")
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away (e.g. cancelled); nothing left to do
+            pass
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def _openai_chat(self, payload):
+        model = payload.get("model", "gpt-3.5-turbo")
+        prompt = last_user_message(payload.get("messages", []))
+        response_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        if not payload.get("stream"):
+            text = "".join(self._generate(prompt)).strip()
+            self._send_json(200, {
+                "id": response_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split()), "total_tokens": len(prompt.split()) + len(text.split())},
+            })
+            return
+        self._start_stream("text/event-stream")
+        base = {"id": response_id, "object": "chat.completion.chunk", "created": created, "model": model}
+        for piece in self._generate(prompt):
+            chunk = dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+            self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+        chunk = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._end_stream()
+
+    def _ollama(self, payload, chat):
+        model = payload.get("model", "mock:latest")
+        if chat:
+            prompt = last_user_message(payload.get("messages", []))
+        else:
+            prompt = payload.get("prompt", "")
+        started = time.monotonic()
+
+        def record(text, done):
+            # /api/chat wraps text in a message, /api/generate uses "response"
+            data = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            return data
+
+        def final_stats(count):
+            elapsed = int((time.monotonic() - started) * 1e9)
+            return {"done_reason": "stop", "total_duration": elapsed, "eval_count": count, "eval_duration": elapsed}
+
+        # Ollama streams unless "stream" is explicitly false
+        if payload.get("stream", True) is False:
+            pieces = list(self._generate(prompt))
+            data = record("".join(pieces).strip(), True)
+            data.update(final_stats(len(pieces)))
+            self._send_json(200, data)
+            return
+        self._start_stream("application/x-ndjson")
+        count = 0
+        for piece in self._generate(prompt):
+            count += 1
+            self._send_chunk((json.dumps(record(piece, False)) + "\n").encode())
+        data = record("", True)
+        data.update(final_stats(count))
+        self._send_chunk((json.dumps(data) + "\n").encode())
+        self._end_stream()
+
+
+# ===================================================
+# SERVER STARTUP
+# ===================================================
+class MockServer(ThreadingHTTPServer):
+    """Threaded HTTP server that stays quiet when clients hang up mid-request."""
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def make_server(config, host="127.0.0.1", port=8799):
+    """Create (but do not start) a mock server. Use port 0 to pick a free port."""
+    server = MockServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.random = random.Random(config.seed)
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI- and Ollama-compatible mock LLM server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency", type=float, default=MockConfig.latency, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=MockConfig.token_rate, help="tokens per second (0 = instant)")
+    parser.add_argument("--tokens", type=int, default=MockConfig.tokens, help="approximate tokens per response")
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate, help="fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=MockConfig.rate_limit_rate, help="fraction of requests failing with 429")
+    parser.add_argument("--max-concurrency", type=int, default=MockConfig.max_concurrency, help="429 above this many in-flight requests")
+    parser.add_argument("--retry-after", type=float, default=MockConfig.retry_after, help="Retry-After seconds on 429")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = MockConfig(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        tokens=args.tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_concurrency=args.max_concurrency,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    server = make_server(config, args.host, args.port)
+    print(f"Mock LLM server listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
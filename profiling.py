@@ -0,0 +1,321 @@
+# profiling.py
+# ------------
+# Opt-in profiling of single requests, for finding out why one request was slow.
+# When enabled, a request is profiled from the goal check to the rendered plan and
+# written to the profiles/ folder as:
+#   <id>.speedscope.json  open at https://www.speedscope.app (flame graph per thread,
+#                         plus a timeline of the request's stages)
+#   <id>.prof             (cprofile mode only) pstats file for snakeviz, flameprof, etc.
+#                         cProfile only sees the thread that started the request;
+#                         worker threads (e.g. the backend call) are sampled into
+#                         the speedscope file instead
+#   <id>.json             request metadata and stage durations
+#
+# Enable it with any of:
+#   GOAL_PROFILE=sample      (or "cprofile") environment variable, for every request
+#   GOAL_PROFILE_RATE=0.05   profile only this fraction of those requests
+#   ?profile=1               URL query parameter on the Streamlit app (?profile=cprofile too)
+#   python main.py --profile main.py flag
+# Other settings: GOAL_PROFILE_DIR (default "profiles"), GOAL_PROFILE_INTERVAL_MS (default 5),
+# GOAL_PROFILE_MAX_SECONDS (default 300).
+#
+# Only the request's own threads are sampled: the thread that started it and
+# worker threads running functions wrapped with bind() (other sessions' requests
+# on a shared server stay out of the profile).
+#
+# When profiling is off, start_request() returns a shared do-nothing profile and
+# stage() returns a shared do-nothing context manager, so the hooks cost next to nothing.
+
+# --- Import required libraries ---
+import contextvars  # contextvars carries the active profile into asyncio.to_thread workers
+import cProfile     # cProfile is the deterministic profiler
+import json         # json writes the speedscope and metadata files
+import os           # os reads the configuration and builds file paths
+import random       # random picks which requests are profiled
+import sys          # sys reads the stacks of running threads
+import threading    # threading runs the sampler
+import time         # time stamps samples and stages
+import uuid         # uuid names each profile
+
+# ===================================================
+# CONFIGURATION
+# ===================================================
+PROFILE_MODE = os.environ.get("GOAL_PROFILE", "").strip().lower()
+if PROFILE_MODE in ("1", "true", "yes", "on"):
+    PROFILE_MODE = "sample"
+if PROFILE_MODE not in ("sample", "cprofile"):
+    PROFILE_MODE = ""
+PROFILE_RATE = float(os.environ.get("GOAL_PROFILE_RATE", "1"))
+PROFILE_DIR = os.environ.get("GOAL_PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = float(os.environ.get("GOAL_PROFILE_INTERVAL_MS", "5")) / 1000
+# The sampler stops by itself after this long, in case a request never calls finish()
+# (e.g. Streamlit stopped the script when the user clicked again)
+MAX_SAMPLE_SECONDS = float(os.environ.get("GOAL_PROFILE_MAX_SECONDS", "300"))
+
+# Leaf functions of threads that are just waiting; such samples are dropped
+IDLE_FUNCTIONS = {"wait", "select", "poll", "epoll", "_wait_for_tstate_lock", "get", "accept", "sleep"}
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "socketserver.py")
+
+# The profile of the request running in the current thread or task
+_current = contextvars.ContextVar("goal_profile", default=None)
+
+
+# ===================================================
+# DISABLED PROFILE
+# ===================================================
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class NullProfile:
+    """Profile used when profiling is off; every method does nothing."""
+    enabled = False
+
+    def stage(self, name):
+        return NULL_STAGE
+
+    def finish(self, **metadata):
+        return None
+
+
+NULL_PROFILE = NullProfile()
+
+
+# ===================================================
+# ACTIVE PROFILE
+# ===================================================
+class RequestProfile:
+    """Profiles one request until finish() is called."""
+    enabled = True
+
+    def __init__(self, mode, metadata):
+        self.mode = mode
+        self.metadata = dict(metadata)
+        self.id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.started = time.perf_counter()
+        self.events = []            # (kind "O"/"C", seconds since start, stage name)
+        self.stage_durations = {}
+        self.frames = {}            # (name, file, line) -> index
+        self.samples = {}           # thread name -> list of (stack, seconds)
+        self.threads = {threading.get_ident(): 1}  # threads working for this request -> nesting depth
+        self.threads_lock = threading.Lock()
+        self.running = True
+        self.token = _current.set(self)
+        if mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Only one deterministic profiler can run at a time; sample this request instead
+                self.mode = "sample"
+        # cProfile only covers this thread, so worker threads are sampled in both modes
+        self.sampler = threading.Thread(target=self._sample, name="goal-profiler", daemon=True)
+        self.sampler.start()
+
+    # -----------------------------------------------
+    # THREADS OF THE REQUEST
+    # -----------------------------------------------
+    def enter_thread(self):
+        ident = threading.get_ident()
+        with self.threads_lock:
+            self.threads[ident] = self.threads.get(ident, 0) + 1
+
+    def leave_thread(self):
+        ident = threading.get_ident()
+        with self.threads_lock:
+            if self.threads.get(ident, 0) > 1:
+                self.threads[ident] -= 1
+            else:
+                self.threads.pop(ident, None)
+
+    # -----------------------------------------------
+    # STAGES
+    # -----------------------------------------------
+    def stage(self, name):
+        return _Stage(self, name)
+
+    # -----------------------------------------------
+    # SAMPLING
+    # -----------------------------------------------
+    def _frame_index(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {}
+        last = time.perf_counter()
+        while self.running:
+            time.sleep(SAMPLE_INTERVAL)
+            now = time.perf_counter()
+            if now - self.started > MAX_SAMPLE_SECONDS:
+                break
+            weight, last = now - last, now
+            with self.threads_lock:
+                threads = set(self.threads)
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident not in threads:
+                    continue
+                code = frame.f_code
+                if code.co_name in IDLE_FUNCTIONS and code.co_filename.endswith(IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_index(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                if ident not in names:
+                    thread = next((t for t in threading.enumerate() if t.ident == ident), None)
+                    names[ident] = f"{thread.name if thread else 'thread'} ({ident})"
+                self.samples.setdefault(names[ident], []).append((stack, weight))
+
+    # -----------------------------------------------
+    # OUTPUT
+    # -----------------------------------------------
+    def finish(self, **metadata):
+        """Stop profiling and write the profile files. Returns the speedscope file path."""
+        if not self.running:
+            return None
+        self.running = False
+        total = time.perf_counter() - self.started
+        if self.mode == "cprofile":
+            self.profiler.disable()
+        self.sampler.join()
+        try:
+            _current.reset(self.token)
+        except ValueError:
+            # finish() was called from another context; that context never saw this profile
+            pass
+        self.metadata.update(metadata)
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, self.id)
+        stage_frames = {}
+        for _, _, name in self.events:
+            stage_frames.setdefault(name, len(self.frames) + len(stage_frames))
+        frame_list = [None] * (len(self.frames) + len(stage_frames))
+        for (name, file, line), index in self.frames.items():
+            frame_list[index] = {"name": name, "file": file, "line": line}
+        for name, index in stage_frames.items():
+            frame_list[index] = {"name": f"stage: {name}"}
+
+        total_ms = round(total * 1000, 3)
+        profiles = [{
+            "type": "evented",
+            "name": "request stages",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": total_ms,
+            "events": [
+                {"type": kind, "frame": stage_frames[name], "at": round(at * 1000, 3)}
+                for kind, at, name in self.events
+            ],
+        }]
+        for thread_name, samples in sorted(self.samples.items()):
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(w for _, w in samples) * 1000, 3),
+                "samples": [stack for stack, _ in samples],
+                "weights": [round(w * 1000, 3) for _, w in samples],
+            })
+        speedscope = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"request {self.id}",
+            "exporter": "goal planner profiling.py",
+            "activeProfileIndex": 1 if len(profiles) > 1 else 0,
+            "shared": {"frames": frame_list},
+            "profiles": profiles,
+        }
+        with open(base + ".speedscope.json", "w") as f:
+            json.dump(speedscope, f)
+        if self.mode == "cprofile":
+            self.profiler.dump_stats(base + ".prof")
+        with open(base + ".json", "w") as f:
+            json.dump({
+                "id": self.id,
+                "mode": self.mode,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - total)),
+                "total_ms": total_ms,
+                "stages_ms": {name: round(ms, 3) for name, ms in self.stage_durations.items()},
+                **self.metadata,
+            }, f, indent=2, default=str)
+        return base + ".speedscope.json"
+
+
+class _Stage:
+    """Records the start and end of one named stage of a request."""
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter() - self.profile.started
+        self.profile.events.append(("O", self.start, self.name))
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter() - self.profile.started
+        self.profile.events.append(("C", end, self.name))
+        durations = self.profile.stage_durations
+        durations[self.name] = durations.get(self.name, 0.0) + (end - self.start) * 1000
+        return False
+
+
+# ===================================================
+# PUBLIC HOOKS
+# ===================================================
+def start_request(mode=None, **metadata):
+    """
+    Start profiling a request if profiling is enabled, either explicitly by `mode`
+    (from a URL parameter or CLI flag; always profiled) or by GOAL_PROFILE (then
+    only the GOAL_PROFILE_RATE fraction of requests is profiled).
+    Returns a profile whose finish() must be called when the request is done.
+    """
+    if not mode:
+        mode = PROFILE_MODE
+        if not mode or (PROFILE_RATE < 1 and random.random() >= PROFILE_RATE):
+            return NULL_PROFILE
+    return RequestProfile("cprofile" if mode == "cprofile" else "sample", metadata)
+
+
+def stage(name):
+    """Context manager marking a stage of the current request (does nothing when not profiling)."""
+    profile = _current.get()
+    if profile is None or not profile.running:
+        return NULL_STAGE
+    return profile.stage(name)
+
+
+def bind(function):
+    """
+    Wrap a function handed to a worker thread (executor.submit, asyncio.to_thread)
+    so that the thread is profiled as part of the current request while it runs.
+    Returns the function unchanged when the current request is not profiled.
+    """
+    profile = _current.get()
+    if profile is None or not profile.running:
+        return function
+
+    def run(*args, **kwargs):
+        token = _current.set(profile)
+        profile.enter_thread()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.leave_thread()
+            _current.reset(token)
+    return run
@@ -0,0 +1,404 @@
+# request_log.py
+# --------------
+# Append-only log of every request and its response, for analytics, cache
+# warming (warm_cache.py) and replay.
+# Requests only put a record on a queue; a background thread writes the records
+# in batches, so logging never waits on the disk.
+#
+# On disk (default folder: logs/):
+#   requests-<start time>-<pid>-<n>.jsonl.gz      a segment: JSON lines, gzip-compressed
+#   requests-<start time>-<pid>-<n>.jsonl.gz.idx  its index, one JSON line per block
+# Each batch is written as its own gzip member ("block"); concatenated members are
+# still a normal .gz file (zcat works), but a reader can also seek straight to one
+# block. The index stores each block's offset, length, time range and request ids,
+# so records can be found by time or id without decompressing whole segments.
+# A new segment starts when the current one reaches GOAL_LOG_SEGMENT_MB or is
+# GOAL_LOG_SEGMENT_MINUTES old. Every process writes its own segments.
+#
+# Configuration (environment variables):
+#   GOAL_LOG=0                   disable the log
+#   GOAL_LOG_DIR=logs            folder for segments
+#   GOAL_LOG_SEGMENT_MB=64       rotate after this many compressed megabytes
+#   GOAL_LOG_SEGMENT_MINUTES=60  rotate after this many minutes
+#
+# Usage:
+#   python request_log.py --since 2025-06-01T09:00 --until 2025-06-01T10:00
+#   python request_log.py --id 3f2a...      # one record
+#   python request_log.py --stats
+
+# --- Import required libraries ---
+import argparse   # argparse reads the options of the command line reader
+import atexit     # atexit flushes the queue when the process exits
+import glob       # glob lists segments
+import gzip       # gzip compresses each block
+import json       # json encodes records and index entries
+import os         # os reads the configuration and builds file paths
+import queue      # queue hands records to the writer thread
+import sys        # sys writes records to stdout in the command line reader
+import threading  # threading runs the writer
+import time       # time stamps records and drives rotation
+import uuid       # uuid gives every request an id
+import zlib       # zlib decompresses single blocks
+from datetime import datetime
+
+# ===================================================
+# CONFIGURATION
+# ===================================================
+LOG_ENABLED = os.environ.get("GOAL_LOG", "1") != "0"
+LOG_DIR = os.environ.get("GOAL_LOG_DIR", "logs")
+SEGMENT_BYTES = int(float(os.environ.get("GOAL_LOG_SEGMENT_MB", "64")) * 1024 * 1024)
+SEGMENT_SECONDS = float(os.environ.get("GOAL_LOG_SEGMENT_MINUTES", "60")) * 60
+
+# Batching: a block is written when it holds this many records or is this old
+BATCH_RECORDS = 256
+FLUSH_SECONDS = 1.0
+# Records waiting for the writer; beyond this, new records are dropped (and counted)
+# rather than slowing requests down
+QUEUE_SIZE = 10000
+
+SEGMENT_PATTERN = "requests-*.jsonl.gz"
+
+# Reading unindexed blocks: read this many bytes at a time, and write the
+# recovered index entries back once a segment has not changed for this long
+SCAN_BUFFER = 64 * 1024
+RECOVER_AFTER_SECONDS = 60
+
+_STOP = object()
+
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+# ===================================================
+# WRITER
+# ===================================================
+class RequestLog:
+    """Queues records and writes them in compressed, indexed blocks from a background thread."""
+
+    def __init__(self, directory=LOG_DIR, segment_bytes=SEGMENT_BYTES, segment_seconds=SEGMENT_SECONDS,
+                 batch_records=BATCH_RECORDS, flush_seconds=FLUSH_SECONDS, queue_size=QUEUE_SIZE):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.batch_records = batch_records
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.segments_started = 0
+        self.data_file = None
+        self.index_file = None
+        self.thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+        self.thread.start()
+
+    def log(self, **fields):
+        """
+        Queue one record and return its request id. Never blocks: if the writer has
+        fallen far behind, the record is dropped and counted in `dropped`.
+        """
+        record = {"request_id": fields.pop("request_id", None) or new_request_id(), "ts": time.time()}
+        record.update(fields)
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        return record["request_id"]
+
+    def flush(self, timeout=10):
+        """Wait until everything queued so far is on disk."""
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        """Write everything still queued and stop the writer."""
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+
+    # -----------------------------------------------
+    # BACKGROUND THREAD
+    # -----------------------------------------------
+    def _run(self):
+        batch = []
+        waiters = []
+        first_queued = None
+        while True:
+            timeout = None if first_queued is None else max(0.0, first_queued + self.flush_seconds - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if isinstance(item, dict):
+                batch.append(item)
+                if first_queued is None:
+                    first_queued = time.monotonic()
+                if len(batch) < self.batch_records:
+                    continue
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            # Batch full, flush interval passed, or flush/close requested
+            if batch:
+                try:
+                    self._write_block(batch)
+                except OSError as e:
+                    self.dropped += len(batch)
+                    print(f"request_log: could not write {len(batch)} records: {e}", file=sys.stderr)
+            batch, first_queued = [], None
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+            if item is _STOP:
+                self._close_segment()
+                return
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.segments_started += 1
+        name = f"requests-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.segments_started:04d}.jsonl.gz"
+        self.segment_path = os.path.join(self.directory, name)
+        self.segment_opened = time.monotonic()
+        self.data_file = open(self.segment_path, "ab")
+        self.index_file = open(self.segment_path + ".idx", "a", encoding="utf-8")
+        self.segment_size = self.data_file.tell()
+
+    def _close_segment(self):
+        if self.data_file is not None:
+            self.data_file.close()
+            self.index_file.close()
+            self.data_file = self.index_file = None
+
+    def _write_block(self, batch):
+        if self.data_file is not None and (
+            self.segment_size >= self.segment_bytes
+            or time.monotonic() - self.segment_opened >= self.segment_seconds
+        ):
+            self._close_segment()
+        if self.data_file is None:
+            self._open_segment()
+
+        data = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=str) + "\n" for r in batch)
+        block = gzip.compress(data.encode("utf-8"), compresslevel=6, mtime=0)
+        offset = self.segment_size
+        self.data_file.write(block)
+        self.data_file.flush()
+        self.segment_size += len(block)
+        # The index is written after the block, so an indexed block is always complete
+        entry = _block_entry(offset, len(block), batch)
+        self.index_file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.index_file.flush()
+
+
+class DisabledLog:
+    """Stand-in used when GOAL_LOG=0: hands out request ids but stores nothing."""
+    dropped = 0
+
+    def log(self, **fields):
+        return fields.get("request_id") or new_request_id()
+
+    def flush(self, timeout=10):
+        return True
+
+    def close(self, timeout=10):
+        pass
+
+
+_default_log = None
+_default_lock = threading.Lock()
+
+
+def default_log():
+    """The process-wide log, started on first use and flushed at exit."""
+    global _default_log
+    with _default_lock:
+        if _default_log is None:
+            _default_log = RequestLog() if LOG_ENABLED else DisabledLog()
+            atexit.register(_default_log.close)
+    return _default_log
+
+
+# ===================================================
+# READER
+# ===================================================
+def segment_paths(directory=LOG_DIR):
+    """Segments in a folder, oldest first."""
+    return sorted(glob.glob(os.path.join(directory, SEGMENT_PATTERN)))
+
+
+def _parse_records(data):
+    for line in data.decode("utf-8").splitlines():
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def _decode_block(raw):
+    return _parse_records(zlib.decompress(raw, wbits=31))
+
+
+def _block_entry(offset, length, records):
+    return {
+        "offset": offset,
+        "length": length,
+        "count": len(records),
+        "ts_min": min(r.get("ts", 0) for r in records),
+        "ts_max": max(r.get("ts", 0) for r in records),
+        "ids": [r.get("request_id") for r in records],
+    }
+
+
+def _scan_blocks(path, start):
+    """
+    Index entries for blocks from `start` on, found by decompressing them one
+    gzip member at a time (for unindexed tails). The file is read in SCAN_BUFFER
+    pieces, so only one block is held in memory at a time.
+    """
+    entries = []
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        pending = b""  # bytes already read that belong to the next block
+        while True:
+            decompressor = zlib.decompressobj(wbits=31)
+            output = []
+            fed = 0
+            while not decompressor.eof:
+                data = pending or f.read(SCAN_BUFFER)
+                pending = b""
+                if not data:
+                    return entries  # end of file, or a block that is still being written
+                fed += len(data)
+                try:
+                    output.append(decompressor.decompress(data))
+                except zlib.error:
+                    return entries
+            pending = decompressor.unused_data
+            length = fed - len(pending)
+            records = list(_parse_records(b"".join(output)))
+            if records:
+                entries.append(_block_entry(offset, length, records))
+            offset += length
+
+
+def _append_index(path, entries):
+    """Write recovered index entries back, so the blocks are not scanned again."""
+    try:
+        with open(path + ".idx", "a+", encoding="utf-8") as f:
+            # A crash may have left half an index line; start recovered entries on a new line
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(f.tell() - 1)
+                if f.read(1) != "\n":
+                    f.write("\n")
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    except OSError:
+        pass
+
+
+def read_index(path):
+    """
+    Index entries of a segment. Blocks missing from the index (e.g. after a crash)
+    are scanned, and written back to the index once the segment is no longer
+    being written to.
+    """
+    entries = []
+    end = 0
+    if os.path.exists(path + ".idx"):
+        with open(path + ".idx", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                # Skip entries indexed twice (a reader and the writer racing)
+                if entry["offset"] >= end:
+                    entries.append(entry)
+                    end = entry["offset"] + entry["length"]
+    if os.path.getsize(path) > end:
+        recovered = _scan_blocks(path, end)
+        if recovered and time.time() - os.path.getmtime(path) > RECOVER_AFTER_SECONDS:
+            _append_index(path, recovered)
+        entries += recovered
+    return entries
+
+
+def iter_records(directory=LOG_DIR, since=None, until=None):
+    """
+    Stream records (oldest first) with since <= ts <= until (epoch seconds, either
+    may be None). Blocks outside the time range are skipped without reading them.
+    """
+    for path in segment_paths(directory):
+        entries = [
+            e for e in read_index(path)
+            if (since is None or e["ts_max"] >= since) and (until is None or e["ts_min"] <= until)
+        ]
+        if not entries:
+            continue
+        with open(path, "rb") as f:
+            for entry in entries:
+                f.seek(entry["offset"])
+                for record in _decode_block(f.read(entry["length"])):
+                    ts = record.get("ts", 0)
+                    if (since is None or ts >= since) and (until is None or ts <= until):
+                        yield record
+
+
+def find(request_id, directory=LOG_DIR):
+    """The record with this request id, or None. Only the block holding it is decompressed."""
+    for path in reversed(segment_paths(directory)):
+        for entry in read_index(path):
+            if request_id in entry["ids"]:
+                with open(path, "rb") as f:
+                    f.seek(entry["offset"])
+                    for record in _decode_block(f.read(entry["length"])):
+                        if record.get("request_id") == request_id:
+                            return record
+    return None
+
+
+# ===================================================
+# COMMAND LINE READER
+# ===================================================
+def parse_time(value):
+    """Epoch seconds from a number or an ISO date/time (local time)."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read the request log as JSON lines.")
+    parser.add_argument("--dir", default=LOG_DIR, help="log folder")
+    parser.add_argument("--since", type=parse_time, help="ISO time or epoch seconds")
+    parser.add_argument("--until", type=parse_time, help="ISO time or epoch seconds")
+    parser.add_argument("--id", help="print only the record with this request id")
+    parser.add_argument("--stats", action="store_true", help="summarize segments instead of printing records")
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        for path in segment_paths(args.dir):
+            entries = read_index(path)
+            count = sum(e["count"] for e in entries)
+            span = ""
+            if entries:
+                first = datetime.fromtimestamp(entries[0]["ts_min"]).isoformat(timespec="seconds")
+                last = datetime.fromtimestamp(entries[-1]["ts_max"]).isoformat(timespec="seconds")
+                span = f"  {first} .. {last}"
+            print(f"{os.path.basename(path)}: {count} records in {len(entries)} blocks, "
+                  f"{os.path.getsize(path) / 1024:.1f} KiB{span}")
+        return
+    if args.id:
+        record = find(args.id, args.dir)
+        if record is None:
+            sys.exit(f"request {args.id} not found")
+        print(json.dumps(record, ensure_ascii=False))
+        return
+    for record in iter_records(args.dir, args.since, args.until):
+        print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
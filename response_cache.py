@@ -0,0 +1,140 @@
+# response_cache.py
+# -----------------
+# A small on-disk cache of generated plans, shared by every process on the machine
+# (the Streamlit app, the CLI and the warm_cache.py job).
+# Plans are keyed by the exact prompt sent to the model (with whitespace and case
+# normalized), the model and the temperature, so a repeated goal is answered
+# instantly instead of paying full model latency again.
+#
+# Configuration (environment variables):
+#   GOAL_CACHE=0                disable the cache
+#   GOAL_CACHE_PATH=...         location of the SQLite file (default .cache/responses.sqlite3)
+#   GOAL_CACHE_TTL_HOURS=168    how long a cached plan stays valid
+
+# --- Import required libraries ---
+import hashlib    # hashlib builds the cache key
+import json       # json serializes the prompt for hashing
+import os         # os reads the configuration and creates the cache folder
+import sqlite3    # sqlite3 stores the cache safely across processes
+import threading  # threading guards the shared connection
+import time       # time implements expiry
+
+# ===================================================
+# CONFIGURATION
+# ===================================================
+CACHE_ENABLED = os.environ.get("GOAL_CACHE", "1") != "0"
+CACHE_PATH = os.environ.get("GOAL_CACHE_PATH", os.path.join(".cache", "responses.sqlite3"))
+CACHE_TTL_SECONDS = float(os.environ.get("GOAL_CACHE_TTL_HOURS", "168")) * 3600
+
+
+def cache_key(model, messages, temperature):
+    """
+    Key for one prompt. Message text is lowercased and its whitespace collapsed,
+    so "Learn to play the piano" and "learn to play  the piano " share an entry.
+    """
+    normalized = [
+        [m["role"], " ".join(m["content"].lower().split())]
+        for m in messages
+    ]
+    payload = json.dumps([model, round(float(temperature), 2), normalized], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# ===================================================
+# CACHE STORAGE
+# ===================================================
+class ResponseCache:
+    """SQLite-backed plan cache with hit/miss counters."""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        # WAL lets the app read while the warm job writes
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, text TEXT, created REAL)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+        self.db.commit()
+
+    def _count(self, name):
+        self.db.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, model, messages, temperature):
+        """Return the cached plan for this prompt, or None. Counts a hit or a miss."""
+        key = cache_key(model, messages, temperature)
+        with self.lock:
+            row = self.db.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+            hit = row is not None and time.time() - row[1] < self.ttl
+            self._count("hits" if hit else "misses")
+            self.db.commit()
+        return row[0] if hit else None
+
+    def contains(self, model, messages, temperature):
+        """True if a fresh plan is cached for this prompt (does not touch the counters)."""
+        key = cache_key(model, messages, temperature)
+        with self.lock:
+            row = self.db.execute("SELECT created FROM responses WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] < self.ttl
+
+    def put(self, model, messages, temperature, text):
+        """Store a plan for this prompt, replacing any older one."""
+        key = cache_key(model, messages, temperature)
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, text, created) VALUES (?, ?, ?, ?)",
+                (key, model, text, time.time()),
+            )
+            self.db.commit()
+
+    def stats(self):
+        """Hit/miss counters and the number of cached plans."""
+        with self.lock:
+            counters = dict(self.db.execute("SELECT name, value FROM stats").fetchall())
+            size = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": size,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def reset_stats(self):
+        with self.lock:
+            self.db.execute("DELETE FROM stats")
+            self.db.commit()
+
+
+class DisabledCache:
+    """Stand-in used when GOAL_CACHE=0: never stores or returns anything."""
+
+    def get(self, model, messages, temperature):
+        return None
+
+    def contains(self, model, messages, temperature):
+        return False
+
+    def put(self, model, messages, temperature, text):
+        pass
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """The process-wide cache, opened on first use."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache() if CACHE_ENABLED else DisabledCache()
+    return _default_cache
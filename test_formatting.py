@@ -0,0 +1,107 @@
+# test_formatting.py
+# ------------------
+# Tests for the output format checks and local repairs in formatting.py.
+# formatting.py is pure text processing, so these run without any backend.
+#
+# Usage:
+#   python -m pytest test_formatting.py
+
+# --- Import required libraries ---
+import formatting  # the module under test
+
+
+# ===================================================
+# FORMAT CHECKS
+# ===================================================
+def test_check_format_accepts_matching_lists():
+    assert formatting.check_format("- a\n- b", "Bullet List")
+    assert formatting.check_format("1. a\n2. b", "Numbered List")
+    assert formatting.check_format("Anything at all", "Standard")
+
+
+def test_check_format_rejects_other_kinds():
+    assert not formatting.check_format("1. a\n2. b", "Bullet List")
+    assert not formatting.check_format("Intro\n- a\n- b", "Bullet List")
+    assert not formatting.check_format("", "Numbered List")
+
+
+# ===================================================
+# LOCAL REPAIRS
+# ===================================================
+def test_intro_and_outro_are_dropped():
+    text = "Here is your plan:\n\n- Research\n- Practice\n\nGood luck with your goal!"
+    assert formatting.ensure_format(text, "Bullet List") == "- Research\n- Practice"
+
+
+def test_numbered_to_bullets():
+    assert formatting.ensure_format("1. Research\n2. Practice", "Bullet List") == "- Research\n- Practice"
+
+
+def test_bullets_to_numbered():
+    assert formatting.ensure_format("- Research\n- Practice", "Numbered List") == "1. Research\n2. Practice"
+
+
+def test_paragraph_becomes_steps():
+    text = "Start by researching the market. Then build a prototype. Finally, launch it."
+    assert formatting.ensure_format(text, "Numbered List") == (
+        "1. Start by researching the market.\n2. Then build a prototype.\n3. Finally, launch it."
+    )
+
+
+def test_indented_nested_lines_stay_with_their_step():
+    text = "1. Research\n   - read books\n   - ask experts\n2. Practice"
+    assert formatting.ensure_format(text, "Bullet List") == (
+        "- Research\n   - read books\n   - ask experts\n- Practice"
+    )
+
+
+def test_unindented_sub_tasks_stay_nested():
+    text = "1. Research:\n- do a\n- do b\n2. Plan:\n- do c\n- do d"
+    # Already numbered at the top level, but the sub-tasks must not become steps
+    assert formatting.repair_format(text, "Numbered List") == (
+        "1. Research:\n   - do a\n   - do b\n2. Plan:\n   - do c\n   - do d"
+    )
+    assert formatting.ensure_format(text, "Bullet List") == (
+        "- Research:\n   - do a\n   - do b\n- Plan:\n   - do c\n   - do d"
+    )
+
+
+def test_mixed_lists_without_nesting_keep_all_steps():
+    text = "1. Research\n2. Practice\n3. Perform\n- Record yourself\n- Rest"
+    steps = [step for step, _ in formatting.extract_steps(text)]
+    assert steps == ["Research", "Practice", "Perform", "Record yourself", "Rest"]
+
+
+def test_wrapped_lines_join_their_item():
+    text = "- Research the market\nand the competition\n- Build a prototype"
+    assert formatting.ensure_format(text, "Numbered List") == (
+        "1. Research the market and the competition\n2. Build a prototype"
+    )
+
+
+# ===================================================
+# LAST RESORT: ASKING AGAIN
+# ===================================================
+def test_fewer_than_two_steps_asks_again():
+    asked = []
+
+    def reask(text):
+        asked.append(text)
+        return "- Research\n- Practice"
+
+    assert formatting.ensure_format("Learn the piano", "Bullet List", reask) == "- Research\n- Practice"
+    assert asked == ["Learn the piano"]
+
+
+def test_matching_text_never_asks_again():
+    def reask(text):
+        raise AssertionError("reask should not be called")
+
+    assert formatting.ensure_format("- a\n- b", "Bullet List", reask) == "- a\n- b"
+
+
+def test_failed_reask_returns_the_original_text():
+    def reask(text):
+        raise RuntimeError("backend down")
+
+    assert formatting.ensure_format("Learn the piano", "Bullet List", reask) == "Learn the piano"
@@ -0,0 +1,90 @@
+# test_request_log.py
+# -------------------
+# Tests for the request log in request_log.py: writing and reading records,
+# segment rotation, lookup by request id and recovery of blocks missing from
+# the index. Everything is written to a temporary folder; no backend is needed.
+#
+# Usage:
+#   python -m pytest test_request_log.py
+
+# --- Import required libraries ---
+import os  # os changes file times and sizes
+
+import request_log  # the module under test
+
+
+def write_records(directory, count, **options):
+    """Log `count` records to a new log in `directory` and return their request ids."""
+    log = request_log.RequestLog(directory=str(directory), flush_seconds=0.05, **options)
+    ids = []
+    for i in range(count):
+        ids.append(log.log(goal=f"goal {i}", plan=f"- step {i}"))
+        log.flush()
+    log.close()
+    return ids
+
+
+# ===================================================
+# WRITING AND READING
+# ===================================================
+def test_records_round_trip(tmp_path):
+    ids = write_records(tmp_path, 5)
+    records = list(request_log.iter_records(str(tmp_path)))
+    assert [r["request_id"] for r in records] == ids
+    assert [r["goal"] for r in records] == [f"goal {i}" for i in range(5)]
+
+
+def test_time_range_filter(tmp_path):
+    write_records(tmp_path, 3)
+    records = list(request_log.iter_records(str(tmp_path)))
+    middle = records[1]["ts"]
+    selected = list(request_log.iter_records(str(tmp_path), since=middle, until=middle))
+    assert [r["request_id"] for r in selected] == [records[1]["request_id"]]
+
+
+def test_segments_rotate(tmp_path):
+    # Every block is bigger than one byte, so each one starts a new segment
+    ids = write_records(tmp_path, 4, segment_bytes=1)
+    assert len(request_log.segment_paths(str(tmp_path))) == 4
+    assert [r["request_id"] for r in request_log.iter_records(str(tmp_path))] == ids
+
+
+def test_find_by_id(tmp_path):
+    ids = write_records(tmp_path, 4, segment_bytes=1)
+    assert request_log.find(ids[2], str(tmp_path))["goal"] == "goal 2"
+    assert request_log.find("missing", str(tmp_path)) is None
+
+
+# ===================================================
+# RECOVERING UNINDEXED BLOCKS
+# ===================================================
+def test_unindexed_tail_is_recovered_and_written_back(tmp_path, monkeypatch):
+    ids = write_records(tmp_path, 3)
+    (path,) = request_log.segment_paths(str(tmp_path))
+    complete = request_log.read_index(path)
+    # Simulate a crash after the first block: the last index line is half written
+    with open(path + ".idx", encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(path + ".idx", "w", encoding="utf-8") as f:
+        f.write(lines[0] + lines[1][:10])
+    # Read in small pieces, so blocks span several reads
+    monkeypatch.setattr(request_log, "SCAN_BUFFER", 16)
+
+    assert request_log.read_index(path) == complete
+    assert [r["request_id"] for r in request_log.iter_records(str(tmp_path))] == ids
+
+    # Once the segment is old enough, the recovered entries are written back
+    old = os.path.getmtime(path) - request_log.RECOVER_AFTER_SECONDS - 1
+    os.utime(path, (old, old))
+    assert request_log.read_index(path) == complete
+    monkeypatch.setattr(request_log, "_scan_blocks", lambda path, start: [])
+    assert request_log.read_index(path) == complete
+
+
+def test_incomplete_last_block_is_ignored(tmp_path):
+    ids = write_records(tmp_path, 2)
+    (path,) = request_log.segment_paths(str(tmp_path))
+    os.remove(path + ".idx")
+    with open(path, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00half a block")
+    assert [r["request_id"] for r in request_log.iter_records(str(tmp_path))] == ids
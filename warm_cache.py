@@ -0,0 +1,236 @@
+# warm_cache.py
+# -------------
+# Fills the response cache (response_cache.py) before traffic arrives, so the
+# first users after a deploy or restart do not pay full model latency for
+# common goals.
+# Goals come from three places:
+#   - the most frequent goals in the request log (request_log.py)
+#   - the bundled goal_examples
+#   - a curated seed list (seed_goals.txt, one goal per line)
+# A plan is generated for every output format, concurrently but under a rate
+# limit, and stored in the cache. Afterwards the command reports how much of
+# the logged traffic the warm set covers.
+#
+# Usage:
+#   python warm_cache.py --top 50 --concurrency 4 --rate 2   # reads logs/ by default
+#   python warm_cache.py --log logs --since 2025-06-01       # only recent traffic
+#   python warm_cache.py --report        # live hit rate since the last warm
+
+# --- Import required libraries ---
+import argparse   # argparse reads the options from the command line
+import asyncio    # asyncio runs several generations at once
+import gzip       # gzip reads compressed log files
+import json       # json decodes log records
+import os         # os checks file and folder paths
+import time       # time spaces requests out under the rate limit
+from collections import Counter
+
+from dotenv import load_dotenv
+import backends
+import formatting
+import request_log
+import response_cache
+
+# Output formats warmed for every goal
+WARM_FORMATS = ["Standard", "Bullet List", "Numbered List"]
+
+# Default curated seed list
+SEED_FILE = "seed_goals.txt"
+
+
+# ===================================================
+# GOAL SOURCES
+# ===================================================
+def normalize_goal(goal):
+    """Collapse whitespace so trivially different spellings count as one goal."""
+    return " ".join(goal.split())
+
+
+def read_log_records(paths, since=None):
+    """
+    Yield request records (dicts) from request log folders (read through their
+    index, see request_log.py) or from plain JSON-lines files (.gz allowed).
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from request_log.iter_records(path, since=since)
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since is None or record.get("ts", 0) >= since:
+                        yield record
+        except OSError:
+            continue
+
+
+def logged_goal(record):
+    """
+    The goal a logged request was planned (and cached) with: long goal
+    descriptions are condensed first (see long_input.py), so their condensed
+    goal is used when it was logged.
+    """
+    return record.get("condensed_goal") or record["goal"]
+
+
+def top_logged_goals(records, top):
+    """The `top` most frequently logged goals, most frequent first."""
+    counts = Counter(normalize_goal(logged_goal(r)) for r in records if r.get("goal") and r.get("valid_goal", True))
+    return [goal for goal, _ in counts.most_common(top)]
+
+
+def read_seed_goals(path):
+    """Goals from a seed file, one per line; blank lines and # comments are ignored."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def bundled_goal_examples():
+    import main
+    return list(main.goal_examples)
+
+
+# ===================================================
+# PROMPTS (ONE PER APP)
+# ===================================================
+def build_messages(source, goal, output_format):
+    """The exact messages app.py ("app") or main.py ("main") send for a goal."""
+    if source == "main":
+        import main
+        return main.Runner.build_messages(main.task_generator, goal, output_format)
+    return backends.build_messages(goal, output_format)
+
+
+# ===================================================
+# RATE-LIMITED WARMING
+# ===================================================
+class RateLimiter:
+    """Lets at most `rate` calls start per second (evenly spaced)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_start = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def warm(jobs, cache, concurrency, rate, force=False):
+    """Generate and cache a plan for each (source, model, goal, format, temperature) job."""
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+    results = Counter()
+
+    async def run(job):
+        source, model, goal, output_format, temperature = job
+        messages = build_messages(source, goal, output_format)
+        if not force and cache.contains(model, messages, temperature):
+            results["already cached"] += 1
+            return
+        async with semaphore:
+            await limiter.wait()
+            try:
+                plan = await asyncio.to_thread(backends.complete, model, messages, temperature, 500 if source == "main" else 300)
+                plan = await asyncio.to_thread(
+                    formatting.ensure_format, plan, output_format,
+                    lambda text: backends.reformat(model, text, output_format),
+                )
+            except Exception as e:
+                results["failed"] += 1
+                print(f"  failed: {goal!r} ({output_format}): {e}")
+                return
+        cache.put(model, messages, temperature, plan)
+        results["warmed"] += 1
+
+    await asyncio.gather(*(run(job) for job in jobs))
+    return results
+
+
+def coverage(records, cache, default_model, default_temperature):
+    """Fraction of logged requests whose prompt is now in the cache (projected hit rate)."""
+    total = covered = 0
+    for record in records:
+        if not record.get("goal") or not record.get("valid_goal", True):
+            continue
+        total += 1
+        messages = build_messages(record.get("source", "app"), normalize_goal(logged_goal(record)), record.get("output_format", "Standard"))
+        if cache.contains(record.get("model", default_model), messages, record.get("temperature", default_temperature)):
+            covered += 1
+    return covered, total
+
+
+# ===================================================
+# COMMAND LINE
+# ===================================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the response cache with popular goals.")
+    parser.add_argument("--log", action="append", default=[],
+                        help=f"request log folder or JSON-lines file (repeatable, default {request_log.LOG_DIR})")
+    parser.add_argument("--since", type=request_log.parse_time, help="only use log records from this ISO time on")
+    parser.add_argument("--top", type=int, default=50, help="number of most frequent logged goals to warm")
+    parser.add_argument("--seeds", default=SEED_FILE, help="curated seed list, one goal per line")
+    parser.add_argument("--no-examples", action="store_true", help="skip the bundled goal_examples")
+    parser.add_argument("--model", action="append", default=[], help="model to warm (repeatable, default 'OpenAI API')")
+    parser.add_argument("--source", choices=["app", "main", "both"], default="app", help="whose prompts to warm")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--concurrency", type=int, default=4, help="generations in flight at once")
+    parser.add_argument("--rate", type=float, default=2.0, help="maximum generations started per second")
+    parser.add_argument("--force", action="store_true", help="regenerate plans that are already cached")
+    parser.add_argument("--report", action="store_true", help="only print the live cache hit rate")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    load_dotenv(override=True)
+    args = parse_args(argv)
+    cache = response_cache.ResponseCache()
+
+    if args.report:
+        stats = cache.stats()
+        print(f"{stats['entries']} cached plans; {stats['hits']} hits / {stats['misses']} misses since the last warm "
+              f"({stats['hit_rate']:.1%} hit rate)")
+        return
+
+    # The log is streamed (twice) rather than loaded, so it can be any size
+    logs = args.log or [request_log.LOG_DIR]
+    goals = top_logged_goals(read_log_records(logs, args.since), args.top)
+    if not args.no_examples:
+        goals += bundled_goal_examples()
+    goals += read_seed_goals(args.seeds)
+    # Keep the first occurrence of each goal (log order = popularity)
+    goals = list(dict.fromkeys(normalize_goal(g) for g in goals))
+
+    models = args.model or ["OpenAI API"]
+    sources = ["app", "main"] if args.source == "both" else [args.source]
+    jobs = [
+        (source, model, goal, output_format, args.temperature)
+        for source in sources for model in models for goal in goals for output_format in WARM_FORMATS
+    ]
+    print(f"Warming {len(jobs)} plans ({len(goals)} goals x {len(WARM_FORMATS)} formats x {len(models)} models x {len(sources)} prompt sets)...")
+    started = time.monotonic()
+    results = asyncio.run(warm(jobs, cache, args.concurrency, args.rate, args.force))
+    print(f"Done in {time.monotonic() - started:.1f}s: "
+          + ", ".join(f"{count} {name}" for name, count in sorted(results.items())))
+
+    covered, total = coverage(read_log_records(logs, args.since), cache, models[0], args.temperature)
+    if total:
+        print(f"Warm set covers {covered} of {total} logged requests ({covered / total:.1%} projected hit rate)")
+    # Count hits from here on, so --report measures the warm set against live traffic
+    cache.reset_stats()
+
+
+if __name__ == "__main__":
+    main()